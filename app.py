@@ -3,7 +3,10 @@ import streamlit as st
 import pandas as pd
 import datetime
 import os
+from src.assets import get_css, get_lottie
 from src.logo_helper import get_logo_html
+from src.session import clear_session, ensure_schedule, get_user_id, get_user_storage, switch_user
+from src.schedule_model import normalize_schedule, schedule_metrics
 
 # Page config
 st.set_page_config(
@@ -14,8 +17,7 @@ st.set_page_config(
 )
 
 # Load custom CSS
-with open("assets/style.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_css("style.css"), unsafe_allow_html=True)
 
 # Particle.js background
 st.components.v1.html("""
@@ -37,61 +39,13 @@ particlesJS('particles-js', {
 
 # Lottie Animation
 from streamlit_lottie import st_lottie
-import json
 
-with open("assets/animation.json") as f:
-    lottie_animation = json.load(f)
-
-# Daily reset logic - clears progress at midnight
-def check_daily_reset():
-    """Wipes daily state when date changes"""
-    today = datetime.date.today()
-    
-    if 'last_reset_date' not in st.session_state:
-        st.session_state.last_reset_date = today
-    
-    if st.session_state.last_reset_date != today:
-        daily_file = "data/daily_state.csv"
-        if os.path.exists(daily_file):
-            os.remove(daily_file)
-        
-        if 'schedule' in st.session_state:
-            del st.session_state.schedule
-        
-        st.session_state.last_reset_date = today
-        st.rerun()
-
-check_daily_reset()
+lottie_animation = get_lottie()
 
 # Session state - persists across page navigation
+# (the midnight reset runs in the background, see src/rollover.py)
 
-if 'schedule' not in st.session_state:
-    daily_file = "data/daily_state.csv"
-    master_file = "data/user_schedule.csv"
-    default_file = "data/default_schedule.csv"
-    
-    # Load today's progress if it exists
-    if os.path.exists(daily_file):
-        st.session_state.schedule = pd.read_csv(daily_file)
-        # Fix type conflicts in data editor
-        if "Custom_Subject" in st.session_state.schedule.columns:
-            st.session_state.schedule["Custom_Subject"] = st.session_state.schedule["Custom_Subject"].fillna("").astype(str)
-    elif os.path.exists(master_file):
-        df = pd.read_csv(master_file)
-        df["Status"] = "Active"
-        df["Actual_Study"] = 0
-        df["Custom_Subject"] = ""
-        st.session_state.schedule = df
-    else:
-        df = pd.read_csv(default_file)
-        df["Status"] = "Active"
-        df["Actual_Study"] = 0
-        df["Custom_Subject"] = ""
-        st.session_state.schedule = df
-    
-    # Remove Date column if it exists
-    if "Date" in st.session_state.schedule.columns:
-        st.session_state.schedule = st.session_state.schedule.drop(columns=["Date"])
+ensure_schedule()
 
 if 'user_name' not in st.session_state:
     st.session_state.user_name = "Student"
@@ -107,14 +61,20 @@ with st.sidebar:
     st.title("🧠 Neural Plan")
     st.write(f"Welcome, **{st.session_state.user_name}**")
     
+    user_id = st.text_input(
+        "👤 Student ID",
+        value=get_user_id(),
+        help="Your schedule and history are kept separately under this ID. Bookmark the page to come back to it."
+    )
+    if switch_user(user_id):
+        st.rerun()
+    
 
     if st.button("🔄 Restore Sample Data"):
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
-            
+        clear_session()
 
-        if os.path.exists("data/user_schedule.csv"):
-            os.remove("data/user_schedule.csv")
+        storage = get_user_storage()
+        storage.clear_schedule()
             
         # Generate sample history
         today = datetime.date.today()
@@ -125,7 +85,7 @@ with st.sidebar:
             {"Date": today - datetime.timedelta(days=4), "Time_Saved": 90, "Time_Used": 90, "Efficiency": 100, "Classes_Cancelled": 1},
             {"Date": today - datetime.timedelta(days=5), "Time_Saved": 180, "Time_Used": 150, "Efficiency": 83, "Classes_Cancelled": 3},
         ]
-        pd.DataFrame(history_data).to_csv("data/history.csv", index=False)
+        storage.replace_history(pd.DataFrame(history_data))
         
         # Generate sample daily state
         if os.path.exists("data/default_schedule.csv"):
@@ -134,7 +94,12 @@ with st.sidebar:
                 df.at[0, "Status"] = "Cancelled"
                 df.at[0, "Actual_Study"] = 45
                 df.at[0, "Custom_Subject"] = "AI Research"
-            df.to_csv("data/daily_state.csv", index=False)
+            storage.save_daily_state(df)
+            # Logged like a page save, so the midnight rollover keeps this row as is
+            sample = schedule_metrics(normalize_schedule(df))
+            storage.upsert_history(
+                today, sample["free_minutes"], sample["studied_minutes"], sample["efficiency"], sample["cancelled"]
+            )
             
         st.rerun()
 
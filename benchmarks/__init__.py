@@ -0,0 +1 @@
+"""Reproducible benchmarks for the plan, timetable and persistence paths (see benchmarks/run.py)"""
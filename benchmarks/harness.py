@@ -0,0 +1,110 @@
+"""Timing, percentile and JSON report helpers shared by the benchmarks"""
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Lower is better for these keys; higher for throughput
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms")
+THROUGHPUT_KEYS = ("throughput_rps",)
+
+
+def summarize(samples, wall_seconds=None):
+    """Latency percentiles (ms) for a list of per-call durations in seconds"""
+    ms = np.asarray(samples) * 1000
+    summary = {
+        "calls": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = round(len(ms) / wall_seconds, 2)
+    return summary
+
+
+def time_calls(fn, repeat):
+    """Runs fn() repeat times in a row and summarizes the latencies"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def run_concurrent(fn, calls, concurrency):
+    """Runs fn(*args) for every args tuple in calls on concurrency threads.
+
+    fn returns True on success. Returns latency percentiles, throughput and
+    the error count.
+    """
+    def timed(args):
+        start = time.perf_counter()
+        try:
+            ok = fn(*args)
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(timed, calls))
+    wall = time.perf_counter() - start
+    summary = summarize([duration for duration, _ in outcomes], wall_seconds=wall)
+    summary["concurrency"] = concurrency
+    summary["errors"] = sum(1 for _, ok in outcomes if not ok)
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_report(results, path, settings):
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "settings": settings,
+        },
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def compare(results, baseline_path, threshold=0.2):
+    """Prints relative changes against an earlier report; returns the regressions"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for key in LATENCY_KEYS + THROUGHPUT_KEYS:
+            if key not in current or not previous.get(key):
+                continue
+            change = (current[key] - previous[key]) / previous[key]
+            worse = change > threshold if key in LATENCY_KEYS else change < -threshold
+            flag = "  <-- regression" if worse else ""
+            print(f"{name:55} {key:15} {previous[key]:>12} -> {current[key]:>12} ({change:+.0%}){flag}")
+            if worse:
+                regressions.append((name, key, change))
+    return regressions
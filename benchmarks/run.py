@@ -0,0 +1,226 @@
+"""Runs the benchmark suite and writes a JSON report.
+
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --output new.json --compare old.json
+
+Requests go to the local LLM backend (src.llm_backends.LocalBackend), and
+every cache and storage file lives in a temporary directory, so runs are
+offline and repeatable.
+"""
+import argparse
+import datetime
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.harness import compare, run_concurrent, time_calls, write_report
+
+# Histories longer than this are spread over extra users (dates must stay within pandas' range)
+MAX_USER_DAYS = 100_000
+
+
+def _isolate(tmp_dir, backend, cooldown, rpm=0):
+    """Points the process-wide backend, key pool and caches at fresh benchmark instances"""
+    from src import cache, key_pool, plan_index
+    from src.llm_backends import set_llm_backend
+    set_llm_backend(backend)
+    key_pool._key_pool = key_pool.KeyPool(backend.default_keys(), cooldown=cooldown, rpm=rpm, max_wait=60)
+    cache_path = os.path.join(tmp_dir, "plan_cache.db")
+    cache._plan_cache = cache.PlanCache(cache_path, max_entries=100_000)
+    cache._timetable_cache = cache.TimetableCache(cache_path)
+    # Benchmark subjects only differ by a number, which never matches; lookups are still timed
+    plan_index._plan_index = plan_index.PlanIndex()
+
+
+def bench_plans(requests, concurrencies):
+    from src.gemini_client import get_study_plan
+
+    def generate(i):
+        return get_study_plan(f"Subject {i}", 60, "Normal Mode 🙂", focus_topic=f"Topic {i}")["success"]
+
+    results, offset = {}, 0
+    for concurrency in concurrencies:
+        calls = [(offset + i,) for i in range(requests)]
+        offset += requests
+        results[f"plans.generate[c={concurrency}]"] = run_concurrent(generate, calls, concurrency)
+    results["plans.cached"] = time_calls(lambda: get_study_plan("Subject 0", 60, "Normal Mode 🙂", "Topic 0"), 200)
+    return results
+
+
+class _Upload:
+    """Just enough of Streamlit's UploadedFile for parse_timetable_image"""
+
+    def __init__(self, data, name="timetable.png", mime_type="image/png"):
+        self._data = data
+        self.name = name
+        self.type = mime_type
+
+    def getvalue(self):
+        return self._data
+
+
+def _timetable_images(count, size=1200):
+    """Distinct PNGs (so none hit the timetable cache), or plain bytes without Pillow"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return [f"not-an-image-{i}".encode() * 1000 for i in range(count)]
+    rng = np.random.default_rng(0)
+    images = []
+    for i in range(count):
+        pixels = rng.integers(200, 256, size=(size, size), dtype=np.uint8)
+        pixels[i % size, :] = 0
+        out = io.BytesIO()
+        Image.fromarray(pixels).save(out, format="PNG")
+        images.append(out.getvalue())
+    return images
+
+
+def bench_timetables(requests, concurrencies):
+    from src.gemini_client import parse_timetable_image
+
+    images = _timetable_images(requests * len(concurrencies))
+    results = {}
+    for n, concurrency in enumerate(concurrencies):
+        calls = [(_Upload(data),) for data in images[n * requests:(n + 1) * requests]]
+        results[f"timetable.parse[c={concurrency}]"] = run_concurrent(
+            lambda upload: parse_timetable_image(upload) is not None, calls, concurrency
+        )
+    return results
+
+
+def _history_frame(rows, start=datetime.date(1800, 1, 1), seed=0):
+    rng = np.random.default_rng(seed)
+    saved = rng.integers(0, 240, rows)
+    used = (saved * rng.random(rows)).astype(int)
+    return pd.DataFrame({
+        "Date": pd.date_range(start, periods=rows, freq="D").date.astype(str),
+        "Time_Saved": saved,
+        "Time_Used": used,
+        "Efficiency": np.where(saved > 0, used * 100 // np.maximum(saved, 1), 0),
+        "Classes_Cancelled": rng.integers(0, 4, rows),
+    })
+
+
+def _make_storage(backend, tmp_dir, rows):
+    """A storage whose user has min(rows, MAX_USER_DAYS) history rows, rows in total"""
+    from src.storage import CSVStorage, SQLiteDatabase, SQLiteStorage
+    user_rows = min(rows, MAX_USER_DAYS)
+    path = os.path.join(tmp_dir, f"{backend}-{rows}")
+    if backend == "csv":
+        storage = CSVStorage(path)
+        storage.replace_history(_history_frame(user_rows))
+        return storage, user_rows
+    database = SQLiteDatabase(path + ".db")
+    storage = SQLiteStorage(database, "bench")
+    storage.replace_history(_history_frame(user_rows))
+    remaining, other = rows - user_rows, 0
+    while remaining > 0:
+        chunk = min(remaining, MAX_USER_DAYS)
+        SQLiteStorage(database, f"other-{other}").replace_history(_history_frame(chunk, seed=other + 1))
+        remaining -= chunk
+        other += 1
+    return storage, user_rows
+
+
+def bench_history(sizes, repeat):
+    from src.rollups import period_for_span
+    from src.schedule_model import normalize_schedule, schedule_metrics
+
+    schedule = pd.read_csv("data/default_schedule.csv")
+    schedule.loc[::3, "Status"] = "Cancelled"
+    schedule = normalize_schedule(schedule)
+    today = datetime.date.today()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for backend in ("sqlite", "csv"):
+            for rows in sizes:
+                storage, user_rows = _make_storage(backend, tmp_dir, rows)
+                label = f"{backend}@{rows}"
+
+                def save():
+                    # Same work as the Save buttons on the Schedule and Insights pages
+                    storage.save_daily_state(schedule)
+                    metrics = schedule_metrics(schedule)
+                    storage.upsert_history(
+                        today, metrics["free_minutes"], metrics["studied_minutes"],
+                        metrics["efficiency"], metrics["cancelled"],
+                    )
+
+                def load_insights(days):
+                    # What pages/3_Insights.py reads for one range
+                    lifetime = storage.load_rollups("month")
+                    since = today - datetime.timedelta(days=days - 1) if days else None
+                    span = days or (today - datetime.date.fromisoformat(lifetime["Date"].min())).days + 1
+                    storage.load_rollups(period_for_span(span), since=since)
+
+                results[f"history.save.{label}"] = {**time_calls(save, repeat), "user_rows": user_rows}
+                for name, days in (("30d", 30), ("365d", 365), ("all", None)):
+                    results[f"history.load_insights_{name}.{label}"] = {
+                        **time_calls(lambda: load_insights(days), repeat), "user_rows": user_rows,
+                    }
+                results[f"history.load_raw.{label}"] = {
+                    **time_calls(storage.load_history, max(1, repeat // 10)), "user_rows": user_rows,
+                }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Neural Plan benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="small sizes for a fast smoke run")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier report to diff against")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean local backend latency (s)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.05, help="share of calls that 429")
+    parser.add_argument("--keys", type=int, default=4)
+    parser.add_argument("--rpm", type=float, default=0, help="client-side requests per minute per key (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", choices=["plans", "timetables", "history"], action="append")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        requests, concurrencies, sizes, repeat = 40, [1, 4], [10, 10_000], 20
+    else:
+        requests, concurrencies, sizes, repeat = 200, [1, 4, 16], [10, 10_000, 1_000_000], 50
+    settings = {**vars(args), "requests": requests, "concurrencies": concurrencies, "sizes": sizes}
+    suites = args.only or ["plans", "timetables", "history"]
+
+    from src.llm_backends import LocalBackend
+    backend = LocalBackend(
+        latency=args.latency, rate_limit_ratio=args.rate_limit_ratio, keys=args.keys, seed=args.seed
+    )
+    # Streamlit warns about the missing script context on every st.* call. Its
+    # loggers are created lazily, and parsing its config resets their level, so
+    # parse the config first and then lower the default for every logger.
+    from streamlit import config as streamlit_config
+    from streamlit.logger import set_log_level
+    streamlit_config.get_option("logger.level")
+    set_log_level("error")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _isolate(tmp_dir, backend, cooldown=1, rpm=args.rpm)
+        if "plans" in suites:
+            results.update(bench_plans(requests, concurrencies))
+        if "timetables" in suites:
+            results.update(bench_timetables(max(4, requests // 4), concurrencies))
+    if "history" in suites:
+        results.update(bench_history(sizes, repeat))
+    settings["backend_calls"], settings["backend_rate_limits"] = backend.calls, backend.rate_limits
+
+    write_report(results, args.output, settings)
+    for name, summary in results.items():
+        extra = f"  {summary['throughput_rps']} req/s, {summary['errors']} errors" if "throughput_rps" in summary else ""
+        print(f"{name:55} p50 {summary['p50_ms']:>10} ms  p95 {summary['p95_ms']:>10} ms{extra}")
+    print(f"\nReport written to {args.output}")
+    if args.compare:
+        print()
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,13 @@
 import streamlit as st
-import pandas as pd
 import datetime
 from streamlit_lottie import st_lottie
-import json
 from src.gemini_client import parse_timetable_image
+from src.timetable_import import is_structured_timetable, parse_structured_timetable
+from src.assets import get_css, get_lottie
 from src.logo_helper import get_logo_html
-import os
+from src.schedule_model import normalize_schedule, schedule_metrics
+from src.persistence import StaleWriteError
+from src.session import STALE_SAVE_MESSAGE, clear_session, ensure_schedule, get_user_storage, save_daily_state
 
 
 with st.sidebar:
@@ -14,53 +16,27 @@ with st.sidebar:
 
     if st.button("🔄 Reset App (Clear All Data)"):
         # Clear Session State
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
-        
+        clear_session()
 
-        if os.path.exists("data/user_schedule.csv"):
-            os.remove("data/user_schedule.csv")
-        if os.path.exists("data/history.csv"):
-            os.remove("data/history.csv")
-        if os.path.exists("data/daily_state.csv"):
-            os.remove("data/daily_state.csv")
+        # Only this student's data is wiped
+        get_user_storage().clear_all()
             
         st.success("App reset successfully. History wiped.")
         st.rerun()
 
-with open("assets/style.css", encoding="utf-8") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_css("style.css", "stylesh.css"), unsafe_allow_html=True)
 
-with open("assets/stylesh.css", encoding="utf-8") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
+lottie_animation = get_lottie()
 
-with open("assets/animation.json", encoding="utf-8") as f:
-    lottie_animation = json.load(f)
 
-
-if 'schedule' not in st.session_state:
-    try:
-        st.session_state.schedule = pd.read_csv("data/default_schedule.csv")
-    except FileNotFoundError:
-        st.error("Default schedule file not found. Please check data/default_schedule.csv")
-        st.stop()
-
-
-if "Date" in st.session_state.schedule.columns:
-    st.session_state.schedule = st.session_state.schedule.drop(columns=["Date"])
-
-
-if "Actual_Study" not in st.session_state.schedule.columns:
-    st.session_state.schedule["Actual_Study"] = 0
+try:
+    ensure_schedule()
+except FileNotFoundError:
+    st.error("Default schedule file not found. Please check data/default_schedule.csv")
+    st.stop()
 
 
-if "Custom_Subject" not in st.session_state.schedule.columns:
-    st.session_state.schedule["Custom_Subject"] = ""
-else:
-    # Fix NaN issues in text columns
-    st.session_state.schedule["Custom_Subject"] = st.session_state.schedule["Custom_Subject"].fillna("").astype(str)
-
 # Hero section
 import datetime
 current_date = datetime.date.today().strftime("%A, %B %d, %Y")
@@ -85,11 +61,16 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
+# Left by the last import, which reruns the page
+if "import_warning" in st.session_state:
+    st.warning(st.session_state.pop("import_warning"))
+
 # Metrics
-total_classes = len(st.session_state.schedule)
-active_classes = len(st.session_state.schedule[st.session_state.schedule["Status"] == "Active"])
-cancelled_classes = len(st.session_state.schedule[st.session_state.schedule["Status"] == "Cancelled"])
-free_time = st.session_state.schedule[st.session_state.schedule["Status"] == "Cancelled"]["Duration"].sum()
+metrics = schedule_metrics(st.session_state.schedule)
+total_classes = metrics["total"]
+active_classes = metrics["active"]
+cancelled_classes = metrics["cancelled"]
+free_time = metrics["free_minutes"]
 
 col1, col2, col3, col4 = st.columns(4)
 
@@ -143,37 +124,53 @@ st.markdown("<br>", unsafe_allow_html=True)
 st.info("ℹ️ **Note:** This is sample schedule data for demonstration. Upload your timetable below to replace it with your actual classes. Once uploaded, go to [Neural Coach](Neural_Coach) to generate study plans!")
 
 # Upload section
-with st.expander("📤 Upload New Timetable (PDF/Image)"):
+with st.expander("📤 Upload New Timetable (PDF/Image/CSV/Excel/Calendar)"):
     st.markdown("""
     <div class="upload-instructions">
         <p>🎯 <strong>Quick Import:</strong> Upload your timetable image or PDF</p>
         <p>🤖 <strong>AI-Powered:</strong> Neural Vision will automatically extract your schedule</p>
+        <p>⚡ <strong>Instant Import:</strong> Portal exports (.csv, .xlsx, .ics) are read directly, no AI needed</p>
     </div>
     """, unsafe_allow_html=True)
     
     st_lottie(lottie_animation, height=150, key="upload")
     
-    uploaded_file = st.file_uploader("Drop your timetable here", type=['png', 'jpg', 'jpeg', 'pdf'])
+    uploaded_file = st.file_uploader("Drop your timetable here", type=['png', 'jpg', 'jpeg', 'pdf', 'csv', 'xlsx', 'ics'])
     
     if uploaded_file is not None:
         if st.button("Analyze & Import"):
             with st.spinner("Neural Vision is reading your schedule..."):
-                new_df = parse_timetable_image(uploaded_file)
+                if is_structured_timetable(uploaded_file.name):
+                    try:
+                        new_df, skipped = parse_structured_timetable(uploaded_file)
+                        st.success(f"✅ Imported {len(new_df)} classes from {uploaded_file.name}!")
+                        if skipped:
+                            # Kept for the rerun below, so the student sees what was left out
+                            st.session_state.import_warning = (
+                                f"⚠️ Skipped {skipped} {'entry' if skipped == 1 else 'entries'} in {uploaded_file.name} "
+                                "whose day, time or duration couldn't be read. Add any missing classes by hand."
+                            )
+                    except Exception as e:
+                        st.error(f"❌ Couldn't import {uploaded_file.name}: {str(e)}")
+                        new_df = None
+                else:
+                    new_df = parse_timetable_image(uploaded_file)
                 
                 if new_df is not None and not new_df.empty:
                     # Clear tracking for fresh start
                     new_df["Status"] = "Active"
                     new_df["Actual_Study"] = 0
                     new_df["Custom_Subject"] = ""
+                    new_df = normalize_schedule(new_df)
                     
-                    new_df.to_csv("data/user_schedule.csv", index=False)
-                    new_df.to_csv("data/daily_state.csv", index=False)
+                    storage = get_user_storage()
+                    storage.save_schedule(new_df)
+                    # A new timetable replaces whatever any other session had
+                    save_daily_state(new_df, overwrite=True)
                     
                     # Auto-wipe history on new upload
-                    if os.path.exists("data/history.csv"):
-                        os.remove("data/history.csv")
+                    storage.clear_history()
                     
-                    st.session_state.schedule = new_df
                     st.success("Timetable updated! Previous history has been cleared.")
                     st.rerun()
 
@@ -227,48 +224,25 @@ st.markdown(f"<p class='last-updated'>Last updated: {datetime.datetime.now().str
 
 st.markdown("<br>", unsafe_allow_html=True)
 if st.button("💾 Save Daily Status", use_container_width=True):
-    st.session_state.schedule = edited
-    edited.to_csv("data/daily_state.csv", index=False)
+    edited = normalize_schedule(edited)
+    try:
+        save_daily_state(edited)
+    except StaleWriteError:
+        st.error(STALE_SAVE_MESSAGE)
+        st.stop()
+    storage = get_user_storage()
     
     # Save to history
-    history_file = "data/history.csv"
     today = datetime.date.today()
     
-    cancelled = edited[edited["Status"] == "Cancelled"]
-    time_saved = cancelled["Duration"].sum()
-    time_used = cancelled["Actual_Study"].sum()
-    efficiency = int((time_used / time_saved * 100)) if time_saved > 0 else 0
-    classes_cancelled = len(cancelled)
-    
-    # Create today's entry
-    new_entry = pd.DataFrame([{
-        'Date': today,
-        'Time_Saved': time_saved,
-        'Time_Used': time_used,
-        'Efficiency': efficiency,
-        'Classes_Cancelled': classes_cancelled
-    }])
-    
-    # Update or append
-    if os.path.exists(history_file):
-        history_df = pd.read_csv(history_file)
-        history_df['Date'] = pd.to_datetime(history_df['Date']).dt.date
-        
-        # Update today's entry if exists, otherwise append
-        if today in history_df['Date'].values:
-            mask = history_df['Date'] == today
-            history_df.loc[mask, 'Time_Saved'] = time_saved
-            history_df.loc[mask, 'Time_Used'] = time_used
-            history_df.loc[mask, 'Efficiency'] = efficiency
-            history_df.loc[mask, 'Classes_Cancelled'] = classes_cancelled
-        else:
-            history_df = pd.concat([history_df, new_entry], ignore_index=True)
-    else:
-        history_df = new_entry
+    saved = schedule_metrics(edited)
     
-    history_df.to_csv(history_file, index=False)
+    # Update today's entry if exists, otherwise append
+    storage.upsert_history(
+        today, saved["free_minutes"], saved["studied_minutes"], saved["efficiency"], saved["cancelled"]
+    )
     
-    cancelled_count = len(cancelled)
+    cancelled_count = saved["cancelled"]
     if cancelled_count > 0:
         st.success(f"✅ Saved! {cancelled_count} classes cancelled for TODAY. Resets at midnight.")
     else:
@@ -1,29 +1,50 @@
 import streamlit as st
 from src import gemini_client
+from src.assets import get_css
 from src.logo_helper import get_logo_html
+from src.schedule_model import schedule_metrics
+from src.session import ensure_schedule
+
+
+def show_quota_wait(*plan_requests):
+    """Tells the student when every API key is at its per-minute limit and calls are queueing"""
+    wait = gemini_client.expected_plan_wait(*plan_requests)
+    if wait >= 1:
+        st.caption(f"⏳ Lots of plans are being written right now. Yours starts in about {int(wait) + 1}s.")
+
+
+def stream_plan(plan_request, regenerate=False):
+    """Renders the plan while it is being written, then keeps the final result"""
+    stream = gemini_client.stream_study_plan(**plan_request, regenerate=regenerate)
+    show_quota_wait(plan_request)
+    st.write_stream(stream)
+    st.session_state.generated_plan = stream.result
+    st.rerun()
 
 
 with st.sidebar:
     st.markdown(get_logo_html(), unsafe_allow_html=True)
 
 
-with open("assets/neural_coach.css", encoding="utf-8") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_css("neural_coach.css"), unsafe_allow_html=True)
 
 st.header("🧠 Neural Coach")
 
 
 st.info("ℹ️ **Note:** Currently using sample schedule data. Upload your own timetable in the [Schedule](Schedule) page for personalized study plans.")
 
+ensure_schedule()
+
 # Check for cancelled classes
 if 'schedule' in st.session_state:
     df = st.session_state.schedule
+    metrics = schedule_metrics(df)
     cancelled_classes = df[df["Status"] == "Cancelled"]
     
-    if cancelled_classes.empty:
+    if metrics["cancelled"] == 0:
         st.info("You have no cancelled classes right now. Go to [Schedule](Schedule) to mark cancelled classes, then return here to generate study plans!")
     else:
-        st.success(f"Opportunity Detected: {len(cancelled_classes)} cancelled slots found.")
+        st.success(f"Opportunity Detected: {metrics['cancelled']} cancelled slots found.")
         
         # Subject selection
         subject_options = list(cancelled_classes["Subject"].unique()) + ["🤖 Let AI Decide", "✏️ Custom Subject"]
@@ -72,28 +93,75 @@ if 'schedule' in st.session_state:
                 if subject_choice == "✏️ Custom Subject" and not subject:
                     st.error("Please enter a subject/topic!")
                 else:
-                    with st.spinner("🧠 Synthesizing Neural Pathways... Consulting AI Brain..."):
-                        import time as time_module
-                        # Call AI
-                        result = gemini_client.get_study_plan(subject, time_minutes, mood, focus_topic, confidence, _timestamp=time_module.time())
-                        st.session_state.generated_plan = result
-                        st.rerun()
+                    st.session_state.plan_request = {
+                        "subject": subject,
+                        "time_available": time_minutes,
+                        "mood": mood,
+                        "focus_topic": focus_topic,
+                        "confidence": confidence,
+                    }
+                    st.caption("🧠 Synthesizing Neural Pathways... Consulting AI Brain...")
+                    # Call AI (served from the plan cache when the same request was made before)
+                    stream_plan(st.session_state.plan_request)
+        
+        # Whole-day mode - every cancelled slot planned in parallel
+        with st.expander(f"🗓️ Plan My Whole Day ({metrics['cancelled']} slots)"):
+            day_mood = st.select_slider(
+                "Neural State for the day",
+                options=["Low Battery 😴", "Power Saving 😐", "Normal Mode 🙂", "Neural Sync 🧘", "Beast Mode 🦁"],
+                value="Normal Mode 🙂",
+                key="day_mood"
+            )
+            
+            if st.button("Plan Every Cancelled Slot 🚀", use_container_width=True):
+                plan_requests = {
+                    f"{row['Day']} {row['Time']} · {row['Subject']}": {
+                        "subject": row["Subject"],
+                        "time_available": int(row["Duration"]),
+                        "mood": day_mood,
+                        "confidence": confidence,
+                    }
+                    for _, row in cancelled_classes.iterrows()
+                }
+                placeholders = {slot_id: st.empty() for slot_id in plan_requests}
+                for slot_id, placeholder in placeholders.items():
+                    placeholder.info(f"⏳ {slot_id}: planning...")
+                show_quota_wait(*plan_requests.values())
+                
+                slot_plans = {}
+                for slot_id, result in gemini_client.get_study_plans_batch(plan_requests):
+                    slot_plans[slot_id] = result
+                    # Each plan shows up as soon as it is ready, not after the slowest one
+                    if result["success"]:
+                        with placeholders[slot_id].container():
+                            with st.expander(f"✅ {slot_id}", expanded=True):
+                                st.markdown(result["message"])
+                    else:
+                        placeholders[slot_id].error(f"{slot_id}: {result['message']}")
+                st.session_state.slot_plans = slot_plans
+                st.rerun()
 
 # Display results
-if st.session_state.generated_plan:
+if st.session_state.get("generated_plan"):
     st.markdown("---")
     
     result = st.session_state.generated_plan
     if result["success"]:
         # Header
-        col1, col2 = st.columns([4, 1])
+        col1, col2, col3 = st.columns([3, 1, 1])
         with col1:
             st.markdown("""
             <h2 style="color: #FF8C42; font-size: 2rem; font-weight: 800; margin-bottom: 0;">
                 ✨ Your Personalized Study Plan
             </h2>
             """, unsafe_allow_html=True)
+            if result.get("similar"):
+                st.caption("⚡ Served instantly from a saved plan for a very similar request. Hit Regenerate for one made just for you.")
+            elif result.get("cached"):
+                st.caption("⚡ Served instantly from saved plans. Hit Regenerate for a fresh one.")
         with col2:
+            regenerate = st.button("Regenerate 🔄", disabled="plan_request" not in st.session_state)
+        with col3:
             if st.button("Clear Plan 🗑️"):
                 st.session_state.generated_plan = None
                 st.rerun()
@@ -122,8 +190,28 @@ if st.session_state.generated_plan:
         </div>
         """, unsafe_allow_html=True)
         
+        if regenerate:
+            stream_plan(st.session_state.plan_request, regenerate=True)
         st.markdown(result["message"])
         
         st.markdown("</div>", unsafe_allow_html=True)
     else:
-        st.error(result["message"])
\ No newline at end of file
+        st.error(result["message"])
+
+# Whole-day plans, one per cancelled slot
+if st.session_state.get("slot_plans"):
+    st.markdown("---")
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        st.subheader("🗓️ Today's Recovery Plans")
+    with col2:
+        if st.button("Clear Day Plans 🗑️"):
+            st.session_state.slot_plans = {}
+            st.rerun()
+    
+    for slot_id, result in st.session_state.slot_plans.items():
+        with st.expander(slot_id, expanded=len(st.session_state.slot_plans) == 1):
+            if result["success"]:
+                st.markdown(result["message"])
+            else:
+                st.error(result["message"])
@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 from src.utils import minutes_to_hours
+from src.assets import get_css
 from src.logo_helper import get_logo_html
+from src.schedule_model import schedule_metrics
+from src.rollups import HISTORY_RANGES, lifetime_totals, period_for_span
+from src.persistence import StaleWriteError
+from src.session import STALE_SAVE_MESSAGE, ensure_schedule, get_user_storage, save_daily_state
 import datetime
-import os
 
 
 with st.sidebar:
@@ -16,8 +19,9 @@ st.header("📊 Accountability Tracker")
 st.info("ℹ️ **Note:** The data shown is sample data for demonstration. Upload your own schedule in the [Schedule](Schedule) page to replace it with your actual timetable. Need help? Check the [Guide](Guide) page!")
 
 
-with open("assets/style.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_css("style.css"), unsafe_allow_html=True)
+
+ensure_schedule()
 
 if 'schedule' in st.session_state:
     df = st.session_state.schedule
@@ -27,19 +31,6 @@ if 'schedule' in st.session_state:
         st.warning("⚠️ Schedule is empty or invalid. Add some classes first!")
         st.stop()
     
-    # Initialize columns if missing
-    if "Actual_Study" not in df.columns:
-        df["Actual_Study"] = 0
-        st.session_state.schedule = df
-    
-    # Initialize Custom_Subject if missing
-    if "Custom_Subject" not in df.columns:
-        df["Custom_Subject"] = ""
-        st.session_state.schedule = df
-    else:
-        # Fix type conflicts
-        df["Custom_Subject"] = df["Custom_Subject"].fillna("").astype(str)
-    
     # Filter cancelled classes only
     cancelled_mask = df["Status"] == "Cancelled"
     cancelled_df = df[cancelled_mask].copy()
@@ -73,46 +64,29 @@ if 'schedule' in st.session_state:
             key="study_logger"
         )
         
+        # Today's schedule with the logged minutes applied, for saving and for the totals
+        live_df = df.copy()
+        live_df.loc[edited_df.index, "Actual_Study"] = edited_df["Actual_Study"].fillna(0).astype("int32")
+        live_df.loc[edited_df.index, "Custom_Subject"] = edited_df["Custom_Subject"].fillna("").astype(str)
+        metrics = schedule_metrics(live_df)
+        
         # Save logic
         if st.button("Save Progress"):
-            # Update session state
-            st.session_state.schedule.update(edited_df)
-            
-            # Persist to disk
-            st.session_state.schedule.to_csv("data/daily_state.csv", index=False)
+            # Persist to disk (also updates session state)
+            try:
+                save_daily_state(live_df)
+            except StaleWriteError:
+                st.error(STALE_SAVE_MESSAGE)
+                st.stop()
+            storage = get_user_storage()
             
             # Save to history
-            history_file = "data/history.csv"
             today = datetime.date.today()
             
-            time_saved = cancelled_df["Duration"].sum()
-            time_used = edited_df["Actual_Study"].sum()
-            efficiency = int((time_used / time_saved * 100)) if time_saved > 0 else 0
-            classes_cancelled = len(cancelled_df)
-            
-            # Create today's entry
-            new_entry = pd.DataFrame([{
-                'Date': today,
-                'Time_Saved': time_saved,
-                'Time_Used': time_used,
-                'Efficiency': efficiency,
-                'Classes_Cancelled': classes_cancelled
-            }])
-            
-            # Update or append
-            if os.path.exists(history_file):
-                history_df = pd.read_csv(history_file)
-                history_df['Date'] = pd.to_datetime(history_df['Date']).dt.date
-                
-                # Update today's entry if exists, otherwise append
-                if today in history_df['Date'].values:
-                    history_df.loc[history_df['Date'] == today, ['Time_Saved', 'Time_Used', 'Efficiency', 'Classes_Cancelled']] = [time_saved, time_used, efficiency, classes_cancelled]
-                else:
-                    history_df = pd.concat([history_df, new_entry], ignore_index=True)
-            else:
-                history_df = new_entry
-            
-            history_df.to_csv(history_file, index=False)
+            # Update today's entry if exists, otherwise append
+            storage.upsert_history(
+                today, metrics["free_minutes"], metrics["studied_minutes"], metrics["efficiency"], metrics["cancelled"]
+            )
             st.success("Progress logged! Checking your stats...")
             st.rerun()
 
@@ -141,7 +115,8 @@ if 'schedule' in st.session_state:
             "Actual_Study": "Actual Work 🔥"
         })
 
-        # Generate chart
+        # Generate chart (plotly is imported on first use to keep cold starts fast)
+        import plotly.express as px
         fig = px.bar(
             chart_data, 
             x="Display_Subject", 
@@ -157,11 +132,11 @@ if 'schedule' in st.session_state:
         st.plotly_chart(fig, use_container_width=True)
 
         # Efficiency score
-        total_goal = cancelled_df["Duration"].sum()
-        total_actual = edited_df["Actual_Study"].sum()
+        total_goal = metrics["free_minutes"]
+        total_actual = metrics["studied_minutes"]
         
         if total_goal > 0:
-            efficiency = int((total_actual / total_goal) * 100)
+            efficiency = metrics["efficiency"]
             
             col1, col2, col3 = st.columns(3)
             col1.metric("Goal Time", minutes_to_hours(total_goal))
@@ -199,61 +174,69 @@ if 'schedule' in st.session_state:
     st.markdown("---")
     st.subheader("📅 Your Long-Term Growth")
 
-    history_file = "data/history.csv"
-    if os.path.exists(history_file):
-        hist_df = pd.read_csv(history_file)
-        
-        if not hist_df.empty:
-            hist_df['Date'] = pd.to_datetime(hist_df['Date'])
-            
-            # Filter for last 7 days
-            cutoff_date = pd.to_datetime('today').normalize() - pd.Timedelta(days=7)
-            hist_df = hist_df[hist_df['Date'] >= cutoff_date].sort_values('Date')
-            
-            metric = st.radio(
-                "Select Trend:", 
-                ["Efficiency %", "Time Saved vs. Used"], 
-                horizontal=True
-            )
-            
-            if metric == "Efficiency %":
-                fig_hist = px.line(
-                    hist_df, 
-                    x="Date", 
-                    y="Efficiency", 
-                    markers=True,
-                    title="Efficiency Trend (Last 7 Days)",
-                    template="plotly_dark",
-                    line_shape="spline"
-                )
-                fig_hist.add_hline(y=50, line_dash="dash", line_color="red", annotation_text="Goal Threshold")
-                fig_hist.update_traces(line_color="#00FF00", line_width=3)
-                fig_hist.update_yaxes(range=[0, 110], title_text="Efficiency (%)")
-                fig_hist.update_xaxes(title_text="Date")
-            else:
-                fig_hist = px.bar(
-                    hist_df, 
-                    x="Date", 
-                    y=["Time_Saved", "Time_Used"],
-                    barmode="group",
-                    title="Minutes Saved vs. Actually Studied",
-                    template="plotly_dark",
-                    color_discrete_map={"Time_Saved": "#3b8ed0", "Time_Used": "#e05353"}
-                )
+    storage = get_user_storage()
+    # Month rollups are tiny even after years of use, and give the lifetime totals
+    lifetime_df = storage.load_rollups("month")
+    if not lifetime_df.empty:
+        range_label = st.radio("Range:", list(HISTORY_RANGES), horizontal=True)
+        range_days = HISTORY_RANGES[range_label]
 
-            st.plotly_chart(fig_hist, use_container_width=True)
-            
-            total_saved_all_time = hist_df["Time_Saved"].sum()
-            total_used_all_time = hist_df["Time_Used"].sum()
-            
-            m1, m2, m3 = st.columns(3)
-            m1.metric("Lifetime Hours Recovered", minutes_to_hours(total_saved_all_time))
-            m2.metric("Lifetime Hours Studied", minutes_to_hours(total_used_all_time))
-            m3.metric("Avg Efficiency", f"{int(hist_df['Efficiency'].mean())}%")
+        # Long ranges are charted per week/month so the chart never gets more than MAX_CHART_POINTS
+        today = datetime.date.today()
+        if range_days is None:
+            since = None
+            span = (today - datetime.date.fromisoformat(lifetime_df["Date"].min())).days + 1
         else:
-            st.info("No history data found yet. Start using the app to build your streak!")
+            since = today - datetime.timedelta(days=range_days - 1)
+            span = range_days
+        period = period_for_span(span)
+        hist_df = storage.load_rollups(period, since=since)
+        hist_df['Date'] = pd.to_datetime(hist_df['Date'])
+        period_note = {"day": "", "week": ", weekly", "month": ", monthly"}[period]
+
+        import plotly.express as px
+
+        metric = st.radio(
+            "Select Trend:", 
+            ["Efficiency %", "Time Saved vs. Used"], 
+            horizontal=True
+        )
+
+        if metric == "Efficiency %":
+            fig_hist = px.line(
+                hist_df, 
+                x="Date", 
+                y="Efficiency", 
+                markers=True,
+                title=f"Efficiency Trend ({range_label}{period_note})",
+                template="plotly_dark",
+                line_shape="spline"
+            )
+            fig_hist.add_hline(y=50, line_dash="dash", line_color="red", annotation_text="Goal Threshold")
+            fig_hist.update_traces(line_color="#00FF00", line_width=3)
+            fig_hist.update_yaxes(range=[0, 110], title_text="Efficiency (%)")
+            fig_hist.update_xaxes(title_text="Date")
+        else:
+            fig_hist = px.bar(
+                hist_df, 
+                x="Date", 
+                y=["Time_Saved", "Time_Used"],
+                barmode="group",
+                title=f"Minutes Saved vs. Actually Studied ({range_label}{period_note})",
+                template="plotly_dark",
+                color_discrete_map={"Time_Saved": "#3b8ed0", "Time_Used": "#e05353"}
+            )
+
+        st.plotly_chart(fig_hist, use_container_width=True)
+
+        lifetime = lifetime_totals(lifetime_df)
+
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Lifetime Hours Recovered", minutes_to_hours(lifetime["time_saved"]))
+        m2.metric("Lifetime Hours Studied", minutes_to_hours(lifetime["time_used"]))
+        m3.metric("Avg Efficiency", f"{int(lifetime['efficiency'])}%")
     else:
-        st.info("History file missing.")
+        st.info("No history data found yet. Start using the app to build your streak!")
 
 else:
     st.warning("No schedule data found. Go to Schedule page first.")
\ No newline at end of file
@@ -1,11 +1,11 @@
 import streamlit as st
+from src.assets import get_css
 from src.logo_helper import get_logo_html
 
 with st.sidebar:
     st.markdown(get_logo_html(), unsafe_allow_html=True)
 
-with open("assets/style.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+st.markdown(get_css("style.css"), unsafe_allow_html=True)
 
 st.markdown("""
 <div style="text-align: center; padding: 2rem 0;">
@@ -0,0 +1,151 @@
+import hmac
+import json
+
+import pandas as pd
+import streamlit as st
+from src.assets import get_css
+from src.cache import get_plan_cache, get_timetable_cache
+from src.hedging import get_hedger
+from src.key_pool import get_key_pool
+from src.logo_helper import get_logo_html
+from src.metrics import get_metrics
+from src.plan_index import get_plan_index
+from src.prompts import PROMPT_VERSION
+from src.singleflight import get_plan_flights
+from src.startup import import_report
+from src.utils import get_secret
+
+
+with st.sidebar:
+    st.markdown(get_logo_html(), unsafe_allow_html=True)
+    # Every student can open this page; key errors and resetting the counters are for operators
+    admin_token = str(get_secret("DIAGNOSTICS_TOKEN", "") or "")
+    entered_token = st.text_input("🔐 Operator token", type="password", help="Set DIAGNOSTICS_TOKEN in secrets to enable")
+    is_operator = bool(admin_token) and hmac.compare_digest(entered_token.encode(), admin_token.encode())
+
+st.markdown(get_css("style.css"), unsafe_allow_html=True)
+
+st.header("🩺 Diagnostics")
+
+metrics = get_metrics()
+pool = get_key_pool()
+hedger = get_hedger()
+snapshot = metrics.snapshot()
+st.caption(f"Counters for this server process, collected over the last {snapshot['uptime_seconds'] / 60:.0f} min.")
+
+
+def counter_total(name, **match):
+    """Sum of a counter over every label set containing match"""
+    return sum(
+        value for labels, value in metrics.counters(name).items()
+        if all((k, str(v)) in labels for k, v in match.items())
+    )
+
+
+def latency_table(name):
+    """One row per label set of a latency histogram, in milliseconds"""
+    rows = []
+    for labels, histogram in sorted(metrics.histograms(name).items()):
+        rows.append({
+            **dict(labels),
+            "calls": histogram["count"],
+            "mean ms": round(histogram["mean"] * 1000, 1),
+            "p50 ms ≤": histogram["p50"] * 1000,
+            "p95 ms ≤": histogram["p95"] * 1000,
+            "p99 ms ≤": histogram["p99"] * 1000,
+        })
+    return pd.DataFrame(rows)
+
+
+# Headline numbers
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Plans served", counter_total("study_plan_total"))
+col2.metric(
+    "From plan cache", counter_total("study_plan_total", source="cache") + counter_total("study_plan_total", source="similar"),
+    help=f"{counter_total('study_plan_total', source='similar')} of them reused a plan for a very similar request"
+)
+col3.metric("LLM calls", counter_total("llm_call_total"))
+col4.metric(
+    "Retries on another key", counter_total("llm_retries_total"),
+    help=f"After a 429 or quota error. {counter_total('llm_hedges_total')} more calls were hedges raced against a slow one"
+)
+st.caption(
+    f"Estimated plan tokens: {counter_total('llm_tokens_total', direction='prompt'):,} prompt, "
+    f"{counter_total('llm_tokens_total', direction='output'):,} output (prompt template {PROMPT_VERSION})."
+)
+
+sections = [
+    ("🧠 Study plans", "study_plan_seconds"),
+    ("🤖 LLM calls (per key)", "llm_call_seconds"),
+    ("⏳ Waiting for API quota", "key_wait_seconds"),
+    ("⚡ Time to first streamed chunk", "llm_first_chunk_seconds"),
+    ("🔍 Timetable parsing", "timetable_parse_seconds"),
+    ("💾 Storage calls", "storage_call_seconds"),
+]
+for title, name in sections:
+    st.subheader(title)
+    table = latency_table(name)
+    if table.empty:
+        st.info("Nothing recorded yet.")
+    else:
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+st.subheader("🔑 API Keys")
+health = pool.health()
+if not is_operator:
+    # Error messages can carry account or quota details
+    health = [{k: v for k, v in row.items() if k != "last_error"} for row in health]
+if health:
+    st.dataframe(pd.DataFrame(health), use_container_width=True, hide_index=True)
+    if not is_operator:
+        st.caption("Enter the operator token in the sidebar to see each key's last error.")
+else:
+    st.info("No API keys configured.")
+
+st.subheader("📦 Caches")
+cache_stats = {"plans": get_plan_cache().stats(), "timetables": get_timetable_cache().stats()}
+hedge_stats = hedger.stats() if hedger else None
+flight_stats = get_plan_flights().stats()
+plan_index = get_plan_index()
+index_stats = plan_index.stats() if plan_index else None
+c1, c2, c3, c4 = st.columns(4)
+c1.metric(
+    "Plan cache hit rate", f"{cache_stats['plans']['hit_rate']:.0%}",
+    help=f"Exact matches; {counter_total('plan_cache_similar_hit_total')} more misses were served a similar plan. "
+    f"{cache_stats['plans']['entries']} plans stored"
+    + (f", {index_stats['entries']} in the similarity index (threshold {index_stats['threshold']})" if index_stats else "")
+)
+c2.metric("Timetable cache hit rate", f"{cache_stats['timetables']['hit_rate']:.0%}", help=f"{cache_stats['timetables']['entries']} timetables stored")
+if hedge_stats:
+    c3.metric(
+        "Hedged requests", f"{hedge_stats['hedges']} / {hedge_stats['requests']}",
+        help=f"{hedge_stats['skipped']} more hedges were skipped because no other key had quota"
+    )
+else:
+    c3.metric("Hedged requests", "off")
+c4.metric(
+    "Coalesced plan requests", flight_stats["followers"],
+    help=f"Identical requests that waited for one already in flight ({flight_stats['in_flight']} running now)"
+)
+
+imports = import_report()
+if imports:
+    st.subheader("🐢 Slowest Imports")
+    st.dataframe(pd.DataFrame(imports), use_container_width=True, hide_index=True)
+
+# Export
+st.markdown("---")
+report = {**snapshot, "keys": health, "caches": cache_stats, "hedging": hedge_stats, "singleflight": flight_stats, "similarity": index_stats, "imports": imports}
+e1, e2, e3 = st.columns(3)
+e1.download_button(
+    "⬇️ Export JSON", json.dumps(report, indent=2), file_name="neuralplan_metrics.json", mime="application/json",
+    use_container_width=True
+)
+e2.download_button(
+    "⬇️ Export Prometheus", metrics.to_prometheus(), file_name="neuralplan_metrics.prom", mime="text/plain",
+    use_container_width=True
+)
+# Counters are process-wide, so only an operator may wipe them for everyone
+if e3.button("🧹 Reset Counters", use_container_width=True, disabled=not is_operator):
+    metrics.reset()
+    st.rerun()
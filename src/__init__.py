@@ -1,3 +1,12 @@
-from . import gemini_client
+import importlib
+
+from . import startup  # noqa: F401 - installs the import timer when NEURALPLAN_IMPORT_TIMING=1
 
 __all__ = ['gemini_client']
+
+
+def __getattr__(name):
+    # Submodules load on first use so pages that never call the API don't pay for google.generativeai
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
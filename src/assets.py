@@ -0,0 +1,60 @@
+"""Process-wide cache for static assets (CSS, Lottie, logo), invalidated on file mtime"""
+import base64
+import json
+import re
+import threading
+from pathlib import Path
+
+ASSETS_DIR = Path(__file__).parent.parent / "assets"
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_SPACE = re.compile(r"\s+")
+_CSS_PUNCT = re.compile(r"\s*([{};,>])\s*")
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _cached(name, transform, mode="r"):
+    """Returns transform(file contents), recomputed only when the file's mtime changes"""
+    path = ASSETS_DIR / name
+    mtime = path.stat().st_mtime_ns
+    key = (name, transform.__name__)
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+    with _lock:
+        kwargs = {"encoding": "utf-8"} if mode == "r" else {}
+        with open(path, mode, **kwargs) as f:
+            value = transform(f.read())
+        _cache[key] = (mtime, value)
+        return value
+
+
+def minify_css(css):
+    css = _CSS_COMMENT.sub("", css)
+    css = _CSS_SPACE.sub(" ", css)
+    return _CSS_PUNCT.sub(r"\1", css).replace(";}", "}").strip()
+
+
+def _style_tag(css):
+    return f"<style>{minify_css(css)}</style>"
+
+
+def get_css(*names):
+    """Minified <style> block for one or more stylesheets in assets/"""
+    return "".join(_cached(name, _style_tag) for name in names)
+
+
+def get_lottie(name="animation.json"):
+    """Parsed Lottie animation (shared - don't mutate it)"""
+    return _cached(name, json.loads)
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode()
+
+
+def get_base64(name):
+    """Base64 of a binary asset, e.g. the logo PNG"""
+    return _cached(name, _b64encode, mode="rb")
@@ -0,0 +1,195 @@
+"""Persistent SQLite caches shared across app replicas"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.prompts import PROMPT_VERSION
+from src.utils import get_secret
+
+
+class SQLiteCache:
+    """Key/value cache stored in a SQLite table with size and age eviction.
+
+    The database runs in WAL mode so several Streamlit replicas pointing at the
+    same file can read and write it concurrently. WAL relies on shared memory,
+    so those replicas must run on the same host: a network filesystem (NFS,
+    SMB, most cloud volumes) can corrupt the file.
+    """
+
+    def __init__(self, path, table, max_entries=1000, max_age=7 * 24 * 3600):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, meta TEXT, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_access ON {table}(last_access)")
+
+    def get(self, key):
+        """Returns the cached value or None if missing/expired"""
+        return self._read(key, count=True)
+
+    def peek(self, key):
+        """Like get, but leaves the hit/miss counters alone (for follow-up lookups after a miss)"""
+        return self._read(key, count=False)
+
+    def _read(self, key, count):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                if count:
+                    self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+            if count:
+                self.hits += 1
+            return row[0]
+
+    def set(self, key, value, meta=None):
+        """Stores a value and evicts expired or least-recently-used rows"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, meta, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, meta, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.max_age,))
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self):
+        """Drops every cached row"""
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self):
+        """Returns hit/miss counters for this process and the shared entry count"""
+        with self._lock:
+            entries = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+        }
+
+
+class PlanCache(SQLiteCache):
+    """Study plan cache keyed on the normalized get_study_plan inputs and the prompt version.
+
+    Plans written by an older prompt template stop matching once
+    PROMPT_VERSION changes and age out through the normal eviction.
+    """
+
+    def __init__(self, path, max_entries=1000, max_age=7 * 24 * 3600, version=PROMPT_VERSION):
+        super().__init__(path, "plans", max_entries=max_entries, max_age=max_age)
+        self.version = version
+
+    @staticmethod
+    def make_key(inputs):
+        """Hashes the inputs so casing/whitespace differences share an entry"""
+        normalized = {
+            k: " ".join(v.split()).casefold() if isinstance(v, str) else v
+            for k, v in inputs.items()
+        }
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def plan_key(self, inputs):
+        """Cache key for plan inputs under this cache's prompt version"""
+        return self.make_key({**inputs, "prompt_version": self.version})
+
+    def get_plan(self, inputs):
+        return self.get(self.plan_key(inputs))
+
+    def put_plan(self, inputs, message):
+        versioned = {**inputs, "prompt_version": self.version}
+        self.set(self.make_key(versioned), message, meta=json.dumps(versioned, ensure_ascii=False))
+
+    def plan_keys(self):
+        """Keys of every plan that hasn't expired"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key FROM {self.table} WHERE created_at >= ?", (time.time() - self.max_age,)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def plan_rows(self, after_rowid=0):
+        """(rowid, key, meta JSON) for plans stored after after_rowid, oldest first"""
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT rowid, key, meta FROM {self.table} WHERE rowid > ? AND meta IS NOT NULL ORDER BY rowid",
+                (after_rowid,),
+            ).fetchall()
+
+
+class TimetableCache(SQLiteCache):
+    """Parsed timetable CSVs keyed on the SHA-256 of the uploaded file bytes"""
+
+    def __init__(self, path, max_entries=200, max_age=30 * 24 * 3600):
+        super().__init__(path, "timetables", max_entries=max_entries, max_age=max_age)
+
+    @staticmethod
+    def make_key(data):
+        return hashlib.sha256(data).hexdigest()
+
+
+_plan_cache = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache():
+    """Returns the process-wide plan cache (one SQLite connection per process)"""
+    global _plan_cache
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            _plan_cache = PlanCache(
+                get_secret("PLAN_CACHE_PATH", "data/plan_cache.db"),
+                max_entries=int(get_secret("PLAN_CACHE_MAX_ENTRIES", 1000)),
+                max_age=float(get_secret("PLAN_CACHE_TTL_HOURS", 168)) * 3600,
+            )
+        return _plan_cache
+
+
+_timetable_cache = None
+_timetable_cache_lock = threading.Lock()
+
+
+def get_timetable_cache():
+    """Returns the process-wide parsed-timetable cache (same database file as plans)"""
+    global _timetable_cache
+    with _timetable_cache_lock:
+        if _timetable_cache is None:
+            _timetable_cache = TimetableCache(get_secret("PLAN_CACHE_PATH", "data/plan_cache.db"))
+        return _timetable_cache
@@ -1,12 +1,39 @@
-"""Gemini API client for AI study plans"""
-import google.generativeai as genai
+"""Study plan and timetable requests, sent through the configured LLM backend (Gemini by default)"""
 import streamlit as st
 import pandas as pd
 import io
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.cache import get_plan_cache, get_timetable_cache
+from src.hedging import get_hedger
+from src.image_prep import estimate_media_tokens, preprocess_image
+from src.key_pool import get_key_pool, is_rate_limited
+from src.llm_backends import get_llm_backend
+from src.metrics import SIZE_BUCKETS, get_metrics
+from src.plan_index import find_similar_plan
+from src.singleflight import get_plan_flights
+from src.prompts import MOOD_MAPPING, PROMPT_VERSION, build_plan_prompt, estimate_tokens
+from src.utils import get_secret
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_plan_inputs(subject, time_available, mood, focus_topic="", confidence=5):
+    """Sanitizes plan inputs; the result is also the plan cache key"""
+    return {
+        "subject": str(subject)[:100],
+        "time_available": max(1, min(int(time_available), 480)),
+        "mood": str(mood) if mood in MOOD_MAPPING else "Normal Mode 🙂",
+        "focus_topic": str(focus_topic)[:200] if focus_topic else "",
+        "confidence": max(1, min(int(confidence), 10)),
+    }
+
 
 # Generate AI study plan
-@st.cache_data(show_spinner=False, ttl=300)
-def get_study_plan(subject, time_available, mood, focus_topic="", confidence=5, _timestamp=None):
+def get_study_plan(subject, time_available, mood, focus_topic="", confidence=5, regenerate=False):
     """Generate a time-specific study plan tailored to the given subject, available minutes, mood, focus topic, and confidence level.
     
     Parameters:
@@ -15,141 +42,345 @@ def get_study_plan(subject, time_available, mood, focus_topic="", confidence=5,
         mood (str): One of the predefined emoji-labeled energy states influencing activity choice.
         focus_topic (str): Specific subtopic or area to focus on (optional).
         confidence (int): Self-rated knowledge level from 1-10.
-        _timestamp (float): Cache-busting parameter (ignored by function, forces fresh API call).
+        regenerate (bool): Skip the persistent plan cache and always call the API.
     
     Returns:
-        dict: {"success": bool, "message": str}
+        dict: {"success": bool, "message": str, "cached": bool, "similar": bool},
+        plus "rate_limited": True when every key was out of quota.
     """
-    # Get API keys
-    keys = [st.secrets.get(f"GEMINI_API_KEY_{i}") for i in range(1, 10)]
-    valid_keys = [k for k in keys if k]
-    
-    if not valid_keys:
-        return {"success": False, "message": "⚠️ No API keys configured!"}
+    inputs = normalize_plan_inputs(subject, time_available, mood, focus_topic, confidence)
+    cache = get_plan_cache()
     
-    # Map mood to energy
-    mood_mapping = {
-        "Low Battery 😴": "extremely low energy, can barely focus",
-        "Power Saving 😐": "low energy, needs easy material",
-        "Normal Mode 🙂": "moderate energy, can handle normal difficulty",
-        "Neural Sync 🧘": "high energy, ready for challenging work",
-        "Beast Mode 🦁": "peak performance, tackle hardest material"
-    }
-    
-    energy_description = mood_mapping.get(mood, "moderate energy")
-    
-    # Focus and difficulty
-    focus_instruction = f"The student wants to focus specifically on: {focus_topic}." if focus_topic else "Provide a comprehensive review of the subject."
-    
-    if confidence <= 3:
-        difficulty_instruction = "Explain concepts like they're a complete beginner. Use simple language, analogies, and step-by-step breakdowns."
-    elif confidence <= 6:
-        difficulty_instruction = "Assume intermediate knowledge. Focus on filling gaps and reinforcing fundamentals."
-    else:
-        difficulty_instruction = "This is an advanced learner. Provide challenging problems, edge cases, and deep conceptual questions."
-    
-    # Determine tone
-    if "Beast Mode" in mood:
-        tone_instruction = "Use aggressive, high-pressure, 'no-excuses' language. Act like a drill sergeant."
-    elif "Low Battery" in mood or "Power Saving" in mood:
-        tone_instruction = "Use very simple sentences and high encouragement. Be gentle."
+    with get_metrics().timed("study_plan") as labels:
+        if not regenerate:
+            cached_plan, source = _lookup_plan(cache, inputs)
+            if cached_plan is not None:
+                labels["source"] = source
+                return {"success": True, "message": cached_plan, "cached": True, "similar": source == "similar"}
+        
+        # Identical requests already in flight share that call's result. Regenerating
+        # asks for a new plan, so it never joins (or leads) one already being written.
+        flights = get_plan_flights()
+        key = cache.plan_key(inputs)
+        call, is_leader = (None, False) if regenerate else flights.begin(key)
+        if call is not None and not is_leader:
+            shared = _wait_for_flight(call)
+            if shared is not None:
+                labels["source"] = "coalesced"
+                labels["result"] = "ok" if shared["success"] else "failed"
+                return {**shared, "cached": False}
+        
+        labels["source"] = "llm"
+        result = None
+        try:
+            result = _generate_study_plan(**inputs)
+            labels["result"] = "ok" if result["success"] else "failed"
+            if result["success"]:
+                _store_plan(cache, inputs, result["message"])
+            result["cached"] = False
+            return result
+        finally:
+            if is_leader:
+                _finish_flight(flights, key, call, result)
+
+
+def _finish_flight(flights, key, call, result):
+    """Hands the leader's outcome to its followers.
+
+    Plans and rate-limit failures are shared: every key is at its limit, so
+    more calls would only queue behind the same quota. Any other failure
+    (or no result at all) makes each follower try its own call.
+    """
+    if result is not None and (result["success"] or result.get("rate_limited")):
+        flights.finish(key, call, result=result)
     else:
-        tone_instruction = "Use a helpful, clear, and motivating coaching tone."
+        flights.finish(key, call, error=RuntimeError(result["message"] if result else "plan call abandoned"))
 
-    # Sanitize inputs
-    subject = str(subject)[:100]
-    time_available = max(1, min(int(time_available), 480))
-    mood = str(mood) if mood in mood_mapping else "Normal Mode 🙂"
-    focus_topic = str(focus_topic)[:200] if focus_topic else ""
-    confidence = max(1, min(int(confidence), 10))
-    
-    # Build prompt
-    prompt = f"""You are a world-class academic coach helping a college student make the most of unexpected free time.
 
-SITUATION:
-- A class was cancelled, giving the student {time_available} minutes of free time
-- They want to study: {subject}
-- Current mental/physical state: {energy_description}
-- Self-rated knowledge level: {confidence}/10
+def _lookup_plan(cache, inputs):
+    """(plan, "cache") for an exact hit, (plan, "similar") for a near-duplicate one, else (None, None)"""
+    try:
+        plan = cache.get_plan(inputs)
+        if plan is not None:
+            return plan, "cache"
+        plan = find_similar_plan(cache, inputs)
+    except sqlite3.Error:
+        # A locked or broken cache file only costs the reuse; the LLM still answers
+        logger.exception("Plan cache lookup failed")
+        return None, None
+    return (plan, "similar") if plan is not None else (None, None)
+
+
+def _store_plan(cache, inputs, message):
+    """Caches a finished plan; a cache error is logged, never shown instead of the plan"""
+    try:
+        cache.put_plan(inputs, message)
+    except sqlite3.Error:
+        logger.exception("Couldn't cache plan")
+
+
+def _wait_for_flight(call):
+    """Leader's result dict, or None if it failed outright or took longer than SINGLEFLIGHT_WAIT_SECONDS"""
+    if not call.done.wait(timeout=float(get_secret("SINGLEFLIGHT_WAIT_SECONDS", 120))):
+        return None
+    return call.result if call.error is None else None
+
 
-SPECIFIC FOCUS:
-{focus_instruction}
+def _llm_call(kind, pool, api_key, attempt, hedge=False):
+    """Times one backend call into llm_call_seconds{kind, key}.
+
+    Attempts past the first count as retries; hedge backups racing a slow
+    call count as hedges instead.
+    """
+    metrics = get_metrics()
+    if hedge:
+        metrics.inc("llm_hedges_total", kind=kind)
+    elif attempt:
+        metrics.inc("llm_retries_total", kind=kind)
+    return metrics.timed("llm_call", kind=kind, key=pool.label(api_key))
 
-DIFFICULTY LEVEL:
-{difficulty_instruction}
 
-YOUR TASK:
-Create a practical, time-specific study plan that matches their energy level and knowledge.
+def _record_response(kind, text):
+    get_metrics().observe("llm_response_chars", len(text), buckets=SIZE_BUCKETS, kind=kind)
 
-TONE:
-{tone_instruction}
 
-RULES:
-1. Break the plan into EXACTLY {time_available} minutes (e.g., "0-15 min: ...", "15-30 min: ...")
-2. For low energy states: Suggest watching videos, reading summaries, reviewing notes (passive learning)
-3. For high energy states: Suggest solving problems, writing code, practicing questions (active learning)
-4. Be SPECIFIC: Name actual resources (Khan Academy, YouTube channels, specific topics to review)
-5. Include a 5-minute break if time > 60 minutes
-6. Format in Markdown with headers and bullet points
-7. If they specified a focus topic, make that the PRIMARY focus of the plan
-8. Adjust difficulty based on their confidence level
+def _rate_limit_failure(last_error, tokens=0):
+    wait = get_key_pool().next_available_in(tokens)
+    if last_error:
+        error_msg = f"❌ All API keys exceeded rate limits. Last error: {last_error}"
+    else:
+        # Turned away by the client-side limiter before anything was sent
+        error_msg = "⏳ All API keys are at their per-minute limit right now."
+    if wait > 0:
+        error_msg += f"\n\n⏳ A key frees up in about {int(wait) + 1}s."
+    return {"success": False, "message": error_msg, "rate_limited": True}
 
-EXAMPLE OUTPUT STRUCTURE:
-## Your {time_available}-Minute {subject} Study Sprint
 
-**Given your energy level ({mood}) and knowledge level ({confidence}/10), here's an optimized plan:**
+def _record_tokens(kind, prompt, text, generation_config):
+    """Logs and counts estimated prompt/output tokens for one plan call; returns their sum"""
+    prompt_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(text)
+    metrics = get_metrics()
+    metrics.inc("llm_tokens_total", prompt_tokens, kind=kind, direction="prompt", prompt_version=PROMPT_VERSION)
+    metrics.inc("llm_tokens_total", output_tokens, kind=kind, direction="output", prompt_version=PROMPT_VERSION)
+    logger.info(
+        "%s call (%s): ~%d prompt tokens, ~%d output tokens (cap %d)",
+        kind, PROMPT_VERSION, prompt_tokens, output_tokens, generation_config["max_output_tokens"],
+    )
+    return prompt_tokens + output_tokens
 
-### 📍 0-15 min: [Activity name]
-- [Specific action 1]
-- [Specific action 2]
 
-[Continue for full duration]
+def _reserved_tokens(prompt, generation_config):
+    """Tokens a plan call may use at most; charged to the key's TPM budget up front"""
+    return estimate_tokens(prompt) + generation_config["max_output_tokens"]
 
-DO NOT ASK ANY FOLLOW BACK QUESTION! BUT GIVE A PERSONALIZED MESSAGE!
 
-Now create the plan:"""
+def _generate_study_plan(subject, time_available, mood, focus_topic, confidence):
+    """Calls the LLM backend with already-normalized inputs"""
+    pool = get_key_pool()
+    
+    if not len(pool):
+        return {"success": False, "message": "⚠️ No API keys configured!"}
+    
+    prompt, generation_config = build_plan_prompt(subject, time_available, mood, focus_topic, confidence)
+    reserved = _reserved_tokens(prompt, generation_config)
     
-    # Try API keys until one works
-    safety_settings = [
-        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-    ]
-    generation_config = {"max_output_tokens": 2048, "temperature": 0.7}
+    def request_plan(api_key):
+        # Any key other than this attempt's own is a backup the hedger raced against it
+        hedge = api_key != primaries[-1]
+        try:
+            with _llm_call("plan", pool, api_key, attempt=len(primaries) > 1, hedge=hedge):
+                text = get_llm_backend().generate_text(api_key, prompt, **generation_config)
+        except Exception as e:
+            pool.report_failure(api_key, str(e))
+            raise
+        pool.report_success(api_key)
+        _record_response("plan", text)
+        pool.settle_tokens(api_key, reserved, _record_tokens("plan", prompt, text, generation_config))
+        return text
     
+    # Try healthy keys until one works; rate-limited keys are benched by the pool.
+    # With hedging on, a slow call gets raced against a second key.
+    hedger = get_hedger() if len(pool) > 1 else None
     last_error = None
-    for api_key in valid_keys:
+    tried = set()
+    primaries = []
+    while (api_key := pool.acquire(exclude=tried, tokens=reserved)) is not None:
+        tried.add(api_key)
+        primaries.append(api_key)
         try:
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-flash-latest')
-            response = model.generate_content(prompt, safety_settings=safety_settings, generation_config=generation_config)
-            return {"success": True, "message": response.text}
+            if hedger:
+                message = hedger.run(request_plan, api_key, pool, tried, tokens=reserved)
+            else:
+                message = request_plan(api_key)
+            return {"success": True, "message": message}
         except Exception as e:
             last_error = str(e)
-            if "429" not in last_error and "quota" not in last_error.lower():
+            if not is_rate_limited(last_error):
                 return {"success": False, "message": f"❌ Error: {last_error}\n\nTry again or check your internet connection."}
     
-    error_msg = f"❌ All API keys exceeded rate limits. Last error: {last_error}" if last_error else "❌ All API keys exceeded rate limits."
-    return {"success": False, "message": error_msg}
+    return _rate_limit_failure(last_error, reserved)
 
 
-# Parse timetable images
-def parse_timetable_image(uploaded_file):
-    """Uses Gemini Vision to extract schedule from image/PDF"""
-    keys = [st.secrets.get(f"GEMINI_API_KEY_{i}") for i in range(1, 11)]
-    valid_keys = [k for k in keys if k]
-    
-    if not valid_keys:
-        st.error("⚠️ No API keys configured!")
-        return None
+class PlanStream:
+    """Iterates over plan text chunks as the backend produces them.
 
-    genai.configure(api_key=valid_keys[0])
-    model = genai.GenerativeModel('gemini-flash-latest')
+    Once iteration finishes, ``result`` holds the same dict get_study_plan
+    would have returned, so callers can store it in session state.
+    """
 
-    bytes_data = uploaded_file.getvalue()
+    def __init__(self, inputs, regenerate=False):
+        self.inputs = inputs
+        self.regenerate = regenerate
+        self.result = None
+
+    def __iter__(self):
+        # Timed like get_study_plan, from the first chunk request until the stream ends or raises
+        with get_metrics().timed("study_plan") as labels:
+            yield from self._serve(labels)
+            if labels["source"] in ("llm", "coalesced"):
+                labels["result"] = "ok" if self.result and self.result["success"] else "failed"
+
+    def _serve(self, labels):
+        cache = get_plan_cache()
+        if not self.regenerate:
+            cached_plan, source = _lookup_plan(cache, self.inputs)
+            if cached_plan is not None:
+                labels["source"] = source
+                self.result = {"success": True, "message": cached_plan, "cached": True, "similar": source == "similar"}
+                yield cached_plan
+                return
+        
+        # A follower gets the leader's whole plan as one chunk once it is done
+        flights = get_plan_flights()
+        key = cache.plan_key(self.inputs)
+        call, is_leader = (None, False) if self.regenerate else flights.begin(key)
+        if call is not None and not is_leader:
+            shared = _wait_for_flight(call)
+            if shared is not None:
+                labels["source"] = "coalesced"
+                self.result = {**shared, "cached": False}
+                if shared["success"]:
+                    yield shared["message"]
+                return
+        
+        labels["source"] = "llm"
+        try:
+            yield from self._generate(cache)
+        finally:
+            # Also runs if the page stops iterating early; followers then make their own call
+            if is_leader:
+                _finish_flight(flights, key, call, self.result)
+
+    def _generate(self, cache):
+        pool = get_key_pool()
+        if not len(pool):
+            self.result = {"success": False, "message": "⚠️ No API keys configured!", "cached": False}
+            return
+        
+        prompt, generation_config = build_plan_prompt(**self.inputs)
+        reserved = _reserved_tokens(prompt, generation_config)
+        last_error = None
+        tried = set()
+        while (api_key := pool.acquire(exclude=tried, tokens=reserved)) is not None:
+            tried.add(api_key)
+            chunks = []
+            try:
+                # Includes the time the page spends rendering between chunks
+                with _llm_call("plan_stream", pool, api_key, attempt=len(tried) > 1):
+                    started = time.perf_counter()
+                    for chunk in get_llm_backend().generate_text(api_key, prompt, stream=True, **generation_config):
+                        if not chunks:
+                            get_metrics().observe("llm_first_chunk_seconds", time.perf_counter() - started)
+                        chunks.append(chunk)
+                        yield chunk
+                pool.report_success(api_key)
+                message = "".join(chunks)
+                _record_response("plan_stream", message)
+                pool.settle_tokens(api_key, reserved, _record_tokens("plan_stream", prompt, message, generation_config))
+                _store_plan(cache, self.inputs, message)
+                self.result = {"success": True, "message": message, "cached": False}
+                return
+            except Exception as e:
+                last_error = str(e)
+                rate_limited = pool.report_failure(api_key, last_error)
+                # Can't fall back to another key once text has been shown
+                if chunks or not rate_limited:
+                    self.result = {"success": False, "message": f"❌ Error: {last_error}\n\nTry again or check your internet connection.", "cached": False}
+                    return
+        
+        self.result = {**_rate_limit_failure(last_error, reserved), "cached": False}
+
+
+def expected_plan_wait(*plan_requests):
+    """Seconds a new plan call would currently queue for API quota (0 if a key is free).
+
+    Each plan request is a dict of get_study_plan keyword arguments; the
+    largest one's token reservation counts against the keys' TPM budgets.
+    """
+    tokens = 0
+    for plan_request in plan_requests:
+        inputs = normalize_plan_inputs(**plan_request)
+        tokens = max(tokens, _reserved_tokens(*build_plan_prompt(**inputs)))
+    return get_key_pool().next_available_in(tokens)
+
+
+def stream_study_plan(subject, time_available, mood, focus_topic="", confidence=5, regenerate=False):
+    """Streaming variant of get_study_plan; iterate the returned PlanStream for text chunks"""
+    inputs = normalize_plan_inputs(subject, time_available, mood, focus_topic, confidence)
+    return PlanStream(inputs, regenerate=regenerate)
+
+
+def get_study_plans_batch(plan_requests, regenerate=False):
+    """Generates plans for several slots in parallel.
+    
+    Parameters:
+        plan_requests (dict): slot id -> get_study_plan keyword arguments.
+        regenerate (bool): Skip the plan cache for every slot.
     
-    prompt = """
+    Yields:
+        tuple: (slot_id, result dict) in the order the plans finish.
+    """
+    if not plan_requests:
+        return
+    # More workers than healthy keys would only queue on 429s
+    max_workers = int(get_secret("BATCH_MAX_WORKERS", 4))
+    workers = max(1, min(len(plan_requests), len(get_key_pool()) or 1, max_workers))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan-batch") as executor:
+        futures = {
+            executor.submit(get_study_plan, **request, regenerate=regenerate): slot_id
+            for slot_id, request in plan_requests.items()
+        }
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def _call_with_pool(pool, call, kind, tokens=0, used_tokens=None):
+    """Runs call(api_key) on pooled keys, moving on only after a 429/quota error.
+
+    tokens is charged to the key's TPM budget up front and, if used_tokens
+    is given, corrected to used_tokens(result) once the call succeeds.
+    """
+    last_error = None
+    tried = set()
+    while (api_key := pool.acquire(exclude=tried, tokens=tokens)) is not None:
+        tried.add(api_key)
+        try:
+            with _llm_call(kind, pool, api_key, attempt=len(tried) > 1):
+                result = call(api_key)
+            pool.report_success(api_key)
+            if used_tokens is not None:
+                pool.settle_tokens(api_key, tokens, used_tokens(result))
+            return result
+        except Exception as e:
+            last_error = str(e)
+            if not pool.report_failure(api_key, last_error):
+                raise
+    if last_error is None:
+        raise RuntimeError(f"All API keys are at their per-minute limit; one frees up in about {int(pool.next_available_in(tokens)) + 1}s")
+    raise RuntimeError(f"All API keys exceeded rate limits. Last error: {last_error}")
+
+
+TIMETABLE_PROMPT = """
     Analyze this image of a timetable. Extract all classes into CSV format.
     
     CRITICAL RULES:
@@ -168,39 +399,160 @@ def parse_timetable_image(uploaded_file):
     Now extract:
     """
 
+REQUIRED_COLUMNS = ["Day", "Time", "Subject", "Duration"]
+# Reserved for the CSV reply (a packed week is ~40 rows of ~15 tokens), settled to the real size after
+TIMETABLE_OUTPUT_TOKENS = 1024
+
+
+class TimetableParseError(Exception):
+    """Raised when Gemini's reply can't be turned into a schedule"""
+
+    def __init__(self, message, raw=None):
+        super().__init__(message)
+        self.raw = raw
+
+
+def _split_pdf_pages(data):
+    """Splits a PDF into single-page PDFs; returns [data] if it can't be split"""
     try:
-        image_part = {"mime_type": uploaded_file.type, "data": bytes_data}
-        response = model.generate_content([prompt, image_part])
-        csv_data = response.text.strip()
-        
-        # Clean markdown artifacts
-        csv_data = csv_data.replace("```csv", "").replace("```", "").strip()
-        
-        # Validate CSV format
-        if not csv_data.startswith("Day,Time,Subject,Duration"):
-            st.error("❌ AI didn't return valid CSV format. Try a clearer image.")
-            with st.expander("🔍 See what AI returned"):
-                st.code(csv_data[:500])
-            return None
-        
-        csv_io = io.StringIO(csv_data)
-        df = pd.read_csv(csv_io)
-        csv_io.close()
-        
-        # Validate columns
-        required_cols = ["Day", "Time", "Subject", "Duration"]
-        if not all(col in df.columns for col in required_cols):
-            st.error(f"❌ Missing required columns. Expected: {required_cols}")
-            return None
-        
-        # Validate types
-        if not pd.api.types.is_numeric_dtype(df["Duration"]):
-            st.error("❌ Duration column must be numeric (minutes)")
-            return None
+        from pypdf import PdfReader, PdfWriter
+        reader = PdfReader(io.BytesIO(data))
+        if len(reader.pages) <= 1:
+            return [data]
+        pages = []
+        for page in reader.pages:
+            writer = PdfWriter()
+            writer.add_page(page)
+            out = io.BytesIO()
+            writer.write(out)
+            pages.append(out.getvalue())
+        return pages
+    except Exception:
+        # pypdf missing or an unusual PDF - send the whole document as before
+        return [data]
+
+
+def _extract_schedule(pool, data, mime_type):
+    """Runs one vision request and validates the CSV it returns (safe to call from worker threads)"""
+    backend = get_llm_backend()
+    input_tokens = estimate_tokens(TIMETABLE_PROMPT) + estimate_media_tokens(data, mime_type)
+    csv_data = _call_with_pool(
+        pool, lambda api_key: backend.extract_table(api_key, TIMETABLE_PROMPT, data, mime_type), kind="timetable",
+        tokens=input_tokens + TIMETABLE_OUTPUT_TOKENS, used_tokens=lambda reply: input_tokens + estimate_tokens(reply),
+    )
+    _record_response("timetable", csv_data)
+    csv_data = csv_data.strip()
+    
+    # Clean markdown artifacts
+    csv_data = csv_data.replace("```csv", "").replace("```", "").strip()
+    
+    # Validate CSV format
+    if not csv_data.startswith("Day,Time,Subject,Duration"):
+        raise TimetableParseError("❌ AI didn't return valid CSV format. Try a clearer image.", raw=csv_data)
+    
+    csv_io = io.StringIO(csv_data)
+    df = pd.read_csv(csv_io)
+    csv_io.close()
+    
+    # Validate columns
+    if not all(col in df.columns for col in REQUIRED_COLUMNS):
+        raise TimetableParseError(f"❌ Missing required columns. Expected: {REQUIRED_COLUMNS}")
+    
+    # Validate types
+    if not pd.api.types.is_numeric_dtype(df["Duration"]):
+        raise TimetableParseError("❌ Duration column must be numeric (minutes)")
+    
+    return df[REQUIRED_COLUMNS].copy()
+
+
+def _merge_page_schedules(frames):
+    """Concatenates per-page schedules and drops classes repeated across pages"""
+    df = pd.concat(frames, ignore_index=True)
+    for col in ["Day", "Time", "Subject"]:
+        df[col] = df[col].astype(str).str.strip()
+    return df.drop_duplicates(subset=["Day", "Time", "Subject"], keep="first").reset_index(drop=True)
+
+
+# Parse timetable images
+def parse_timetable_image(uploaded_file):
+    """Uses the backend's vision model (Gemini Vision by default) to extract schedule from image/PDF.
+    
+    Multi-page PDFs are split and the pages are parsed concurrently on
+    different keys, then merged into one schedule.
+    """
+    with get_metrics().timed("timetable_parse") as labels:
+        df = _parse_timetable(uploaded_file, labels)
+        labels["result"] = "ok" if df is not None else "failed"
+        return df
+
+
+def _parse_timetable(uploaded_file, labels):
+    bytes_data = uploaded_file.getvalue()
+    
+    # Re-uploads of the same file skip the vision call entirely
+    cache = get_timetable_cache()
+    content_key = cache.make_key(bytes_data)
+    try:
+        cached_csv = cache.get(content_key)
+    except sqlite3.Error:
+        logger.exception("Timetable cache lookup failed")
+        cached_csv = None
+    labels["source"] = "cache" if cached_csv is not None else "llm"
+    if cached_csv is not None:
+        df = pd.read_csv(io.StringIO(cached_csv))
+        df["Status"] = "Active"
+        st.success(f"✅ Loaded {len(df)} classes from a previous import of this file!")
+        return df
+    
+    pool = get_key_pool()
+    
+    if not len(pool):
+        st.error("⚠️ No API keys configured!")
+        return None
+
+    if uploaded_file.type == "application/pdf":
+        parts = [(page, "application/pdf") for page in _split_pdf_pages(bytes_data)]
+    else:
+        parts = [preprocess_image(bytes_data, uploaded_file.type)]
+
+    failed_pages = []
+    try:
+        if len(parts) == 1:
+            df = _extract_schedule(pool, *parts[0])
+        else:
+            workers = max(1, min(len(parts), len(pool), int(get_secret("PDF_MAX_WORKERS", 4))))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pdf-page") as executor:
+                futures = [executor.submit(_extract_schedule, pool, data, mime_type) for data, mime_type in parts]
+            
+            frames = []
+            for page_number, future in enumerate(futures, start=1):
+                if future.exception() is None:
+                    frames.append(future.result())
+                else:
+                    failed_pages.append(page_number)
+            
+            if not frames:
+                raise futures[0].exception()
+            if failed_pages:
+                st.warning(f"⚠️ Couldn't read page(s) {', '.join(map(str, failed_pages))}. Check the result below.")
+            df = _merge_page_schedules(frames)
         
+        # A partial result would be served to every re-upload for the cache's TTL
+        if not failed_pages:
+            try:
+                cache.set(content_key, df.to_csv(index=False))
+            except sqlite3.Error:
+                logger.exception("Couldn't cache timetable")
         df["Status"] = "Active"
         st.success(f"✅ Extracted {len(df)} classes successfully!")
         return df
+    
+    except TimetableParseError as e:
+        st.error(str(e))
+        if e.raw:
+            with st.expander("🔍 See what AI returned"):
+                st.code(e.raw[:500])
+        return None
         
     except Exception as e:
         st.error(f"❌ Failed to parse timetable: {str(e)}")
@@ -0,0 +1,126 @@
+"""Hedged Gemini requests: race a backup key when the first call is slow"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from src.metrics import get_metrics
+from src.utils import get_secret
+
+
+class HedgeBudget:
+    """Caps hedges to a fraction of requests.
+
+    Every request earns max_ratio of a token and every hedge spends one, so at
+    most ~max_ratio extra calls are made no matter how slow the API gets.
+    """
+
+    def __init__(self, max_ratio=0.1, burst=2):
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.tokens = burst
+        self.requests = 0
+        self.hedges = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+            self.tokens = min(self.burst, self.tokens + self.max_ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            self.hedges += 1
+            return True
+
+    def refund(self):
+        """Returns the token of a hedge that couldn't be sent (no key had quota)"""
+        with self._lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+            self.hedges -= 1
+            self.skipped += 1
+
+
+class Hedger:
+    """Runs call(api_key) and, after delay seconds, a backup on another healthy key.
+
+    Whichever call succeeds first wins. The loser cannot be interrupted
+    mid-request, so its result is simply ignored. Each primary call gets its
+    own thread, so hedging never caps how many plans run at once; only the
+    (budget-limited) backups share the executor.
+    """
+
+    def __init__(self, delay, max_ratio=0.1, max_workers=8):
+        self.delay = delay
+        self.budget = HedgeBudget(max_ratio)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    @staticmethod
+    def _start_primary(call, api_key):
+        """Starts call(api_key) on a thread of its own; returns its future once it is running"""
+        future = Future()
+        future.set_running_or_notify_cancel()
+        started = threading.Event()
+
+        def run():
+            started.set()
+            try:
+                future.set_result(call(api_key))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="hedge-primary", daemon=True).start()
+        started.wait()
+        return future
+
+    def run(self, call, primary_key, pool, tried, tokens=0):
+        """Returns the first successful result; raises the last error if every attempt fails.
+
+        Keys used for backups are added to tried so the caller doesn't reuse them.
+        A backup is only sent if a key has quota for tokens right away.
+        """
+        self.budget.record_request()
+        # The delay counts from when the primary is actually running
+        pending = {self._start_primary(call, primary_key)}
+        done, pending = wait(pending, timeout=self.delay)
+
+        if not done and self.budget.try_spend():
+            # A skipped hedge isn't a throttled request, so it gets its own counter
+            backup_key = pool.acquire(exclude=tried, tokens=tokens, max_wait=0, count_throttled=False)
+            if backup_key is not None:
+                tried.add(backup_key)
+                pending.add(self._executor.submit(call, backup_key))
+            else:
+                self.budget.refund()
+                get_metrics().inc("hedge_skipped_total")
+
+        last_error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+            if not pending:
+                raise last_error
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+    def stats(self):
+        return {"requests": self.budget.requests, "hedges": self.budget.hedges, "skipped": self.budget.skipped}
+
+
+_hedger = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedger():
+    """Returns the process-wide hedger, or None when PLAN_HEDGE_DELAY_SECONDS is 0"""
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            delay = float(get_secret("PLAN_HEDGE_DELAY_SECONDS", 8))
+            if delay <= 0:
+                return None
+            _hedger = Hedger(delay, max_ratio=float(get_secret("PLAN_HEDGE_MAX_RATIO", 0.1)))
+        return _hedger
@@ -0,0 +1,81 @@
+"""Append-only daily history log with snapshot compaction"""
+import os
+
+import pandas as pd
+
+from src.persistence import StaleWriteError, append_csv_row, atomic_write_csv, file_lock, read_csv, remove_file
+
+HISTORY_COLUMNS = ["Date", "Time_Saved", "Time_Used", "Efficiency", "Classes_Cancelled"]
+COMPACT_THRESHOLD = 200
+
+
+class HistoryLog:
+    """Daily history kept as a compacted snapshot plus an append-only log.
+
+    Saving a day appends one line to the log, whatever the size of the history.
+    Reading merges snapshot and log with the latest entry per date winning.
+    compact() folds the log back into the snapshot. Reads do this
+    automatically once the log grows past compact_threshold lines.
+    """
+
+    def __init__(self, snapshot_file, log_file, compact_threshold=COMPACT_THRESHOLD):
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.compact_threshold = compact_threshold
+
+    def append(self, date, time_saved, time_used, efficiency, classes_cancelled):
+        """Records a day's totals; replaces any earlier entry for the same date on read"""
+        row = [str(date), int(time_saved), int(time_used), int(efficiency), int(classes_cancelled)]
+        append_csv_row(self.log_file, HISTORY_COLUMNS, row)
+
+    def read(self):
+        """Returns the compacted view (one row per date, sorted), or None if empty"""
+        with file_lock(self.log_file, shared=True):
+            snapshot_df, _ = read_csv(self.snapshot_file)
+            log_df = pd.read_csv(self.log_file) if os.path.exists(self.log_file) else None
+        if log_df is not None and len(log_df) >= self.compact_threshold:
+            try:
+                return self.compact()
+            except StaleWriteError:
+                # Someone replaced the snapshot mid-compaction; the next read retries
+                pass
+        return self._merge(snapshot_df, log_df)
+
+    def compact(self):
+        """Folds the log into the snapshot and truncates the log.
+
+        Appends wait on the log lock meanwhile, so no entry can slip in
+        between reading the log and deleting it.
+        """
+        with file_lock(self.log_file):
+            snapshot_df, snapshot_version = read_csv(self.snapshot_file)
+            log_df = pd.read_csv(self.log_file) if os.path.exists(self.log_file) else None
+            merged = self._merge(snapshot_df, log_df)
+            if log_df is not None:
+                if merged is not None:
+                    atomic_write_csv(merged, self.snapshot_file, expected_version=snapshot_version)
+                os.remove(self.log_file)
+        return merged
+
+    def replace(self, df):
+        """Overwrites the whole history (sample data, migrations)"""
+        with file_lock(self.log_file):
+            atomic_write_csv(df, self.snapshot_file)
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+
+    def clear(self):
+        with file_lock(self.log_file):
+            remove_file(self.snapshot_file)
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
+
+    @staticmethod
+    def _merge(snapshot_df, log_df):
+        frames = [df for df in (snapshot_df, log_df) if df is not None and not df.empty]
+        if not frames:
+            return snapshot_df
+        merged = pd.concat(frames, ignore_index=True)
+        merged["Date"] = pd.to_datetime(merged["Date"]).dt.date.astype(str)
+        merged = merged.drop_duplicates(subset="Date", keep="last")
+        return merged.sort_values("Date").reset_index(drop=True)
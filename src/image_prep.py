@@ -0,0 +1,55 @@
+"""Shrinks timetable photos before they are sent to Gemini Vision, and sizes them in tokens"""
+import io
+import math
+
+MAX_SIDE = 1600
+JPEG_QUALITY = 85
+# Gemini bills a small image, each 768px tile of a larger one and each PDF page at this many tokens
+MEDIA_TOKENS = 258
+SMALL_IMAGE_SIDE = 384
+TILE_SIDE = 768
+
+
+def preprocess_image(data, mime_type, max_side=MAX_SIDE):
+    """Downscales, converts to high-contrast grayscale and re-encodes as JPEG.
+    
+    Returns:
+        tuple: (bytes, mime_type). Non-images, unreadable files and images that
+        would not get smaller are returned unchanged.
+    """
+    if not mime_type or not mime_type.startswith("image/"):
+        return data, mime_type
+    
+    try:
+        from PIL import Image, ImageOps
+        img = Image.open(io.BytesIO(data))
+        # Phone photos are often stored sideways with an EXIF rotation flag
+        img = ImageOps.exif_transpose(img)
+        img = img.convert("L")
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+        img = ImageOps.autocontrast(img, cutoff=1)
+        
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    except Exception:
+        return data, mime_type
+    
+    processed = out.getvalue()
+    if len(processed) >= len(data):
+        return data, mime_type
+    return processed, "image/jpeg"
+
+
+def estimate_media_tokens(data, mime_type):
+    """Input tokens Gemini counts for an image or PDF (unreadable files count as a MAX_SIDE image)"""
+    try:
+        if mime_type == "application/pdf":
+            from pypdf import PdfReader
+            return MEDIA_TOKENS * max(1, len(PdfReader(io.BytesIO(data)).pages))
+        from PIL import Image
+        width, height = Image.open(io.BytesIO(data)).size
+    except Exception:
+        width = height = MAX_SIDE
+    if width <= SMALL_IMAGE_SIDE and height <= SMALL_IMAGE_SIDE:
+        return MEDIA_TOKENS
+    return MEDIA_TOKENS * math.ceil(width / TILE_SIDE) * math.ceil(height / TILE_SIDE)
@@ -0,0 +1,243 @@
+"""Shared Gemini API key pool with per-key rate limits, cooldowns and health"""
+import re
+import threading
+import time
+
+from src.llm_backends import get_llm_backend
+from src.metrics import get_metrics
+from src.utils import get_secret
+
+MAX_KEYS = 10
+MAX_COOLDOWN = 600
+# Buckets hold this many seconds' worth of quota, so bursts stay close to the per-minute limit
+BURST_SECONDS = 10
+
+# Gemini 429s usually carry a retry hint, e.g. "Please retry in 23.4s" or "retry_delay { seconds: 23 }"
+_RETRY_HINT = re.compile(r"retry in ([\d.]+)s|retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+
+def is_rate_limited(error):
+    """True if an API error message means the key is out of quota"""
+    return "429" in error or "quota" in error.lower()
+
+
+def load_api_keys():
+    """Reads GEMINI_API_KEY_1..GEMINI_API_KEY_10 from secrets, skipping blanks"""
+    keys = [get_secret(f"GEMINI_API_KEY_{i}") for i in range(1, MAX_KEYS + 1)]
+    return [k for k in keys if k]
+
+
+class TokenBucket:
+    """Refills at per_minute / 60 per second up to a few seconds' worth of burst.
+
+    A rate of 0 means unlimited.
+    """
+
+    def __init__(self, per_minute, burst_seconds=BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (requests larger than the bucket wait for a full one)"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount, now):
+        if self.rate:
+            self._refill(now)
+            self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount, now):
+        """Returns unused reserved tokens (negative amounts charge an overrun)"""
+        if self.rate:
+            self._refill(now)
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _KeyState:
+    def __init__(self, label, key, rpm=0, tpm=0):
+        self.label = label
+        self.key = key
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.last_used = 0.0
+        self.cooldown_until = 0.0
+        self.consecutive_limits = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limits = 0
+        self.throttled = 0
+        self.last_error = None
+
+    def wait_time(self, tokens, now, clock):
+        """Seconds until this key may send a request of tokens size"""
+        return max(
+            self.cooldown_until - clock,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(tokens, now),
+        )
+
+
+class KeyPool:
+    """Spreads calls over API keys, keeps each key under its RPM/TPM limits
+    and benches keys that still hit 429/quota.
+
+    Strategies:
+        "round_robin": rotate through keys in order.
+        "lru": pick the key that has been idle the longest.
+
+    rpm/tpm are per-key requests and tokens per minute (0 = no limit). A call
+    that would exceed them waits for quota for up to max_wait seconds instead
+    of being sent and bounced with a 429.
+    """
+
+    def __init__(self, keys, strategy="round_robin", cooldown=60, rpm=0, tpm=0, max_wait=10):
+        if strategy not in ("round_robin", "lru"):
+            raise ValueError(f"Unknown key pool strategy: {strategy}")
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.max_wait = max_wait
+        self._states = [_KeyState(f"Key {i}", key, rpm, tpm) for i, key in enumerate(keys, start=1)]
+        self._by_key = {state.key: state for state in self._states}
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._states)
+
+    def acquire(self, exclude=(), tokens=0, max_wait=None, count_throttled=True):
+        """Returns the next key not in exclude with quota for a call of about tokens.
+
+        Waits up to max_wait seconds (default: the pool's) for a key to free up.
+        Returns None if none will in time; next_available_in() then says how long.
+        count_throttled=False leaves that out of the throttle counters, for
+        optional calls such as hedges that are fine to skip.
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        wait_started = None
+        while True:
+            now, clock = time.monotonic(), time.time()
+            with self._lock:
+                candidates = [(i, s) for i, s in enumerate(self._states) if s.key not in exclude]
+                if not candidates:
+                    return None
+                waits = {i: s.wait_time(tokens, now, clock) for i, s in candidates}
+                available = [(i, s) for i, s in candidates if waits[i] <= 0]
+                if available:
+                    if self.strategy == "lru":
+                        index, state = min(available, key=lambda item: item[1].last_used)
+                    else:
+                        n = len(self._states)
+                        index, state = min(available, key=lambda item: (item[0] - self._cursor) % n)
+                        self._cursor = (index + 1) % n
+                    state.last_used = clock
+                    state.requests.take(1, now)
+                    state.tokens.take(tokens, now)
+                    break
+                wait = min(waits.values())
+                if now + wait > deadline:
+                    if count_throttled:
+                        for _, s in candidates:
+                            s.throttled += 1
+                        get_metrics().inc("key_throttled_total")
+                    return None
+            if wait_started is None:
+                wait_started = now
+            time.sleep(wait)
+        if wait_started is not None:
+            get_metrics().observe("key_wait_seconds", now - wait_started)
+        return state.key
+
+    def settle_tokens(self, key, reserved, used):
+        """Corrects a key's token bucket once the real size of a call is known"""
+        with self._lock:
+            self._by_key[key].tokens.give_back(reserved - used, time.monotonic())
+
+    def label(self, key):
+        """Display name ("Key 2") for a key - safe to show or use as a metric label"""
+        state = self._by_key.get(key)
+        return state.label if state else "unknown"
+
+    def report_success(self, key):
+        with self._lock:
+            state = self._by_key[key]
+            state.successes += 1
+            state.consecutive_limits = 0
+
+    def report_failure(self, key, error):
+        """Records a failed call; rate-limited keys are benched until they recover"""
+        with self._lock:
+            state = self._by_key[key]
+            state.failures += 1
+            state.last_error = error[:200]
+            if not is_rate_limited(error):
+                return False
+            state.rate_limits += 1
+            state.consecutive_limits += 1
+            hint = _RETRY_HINT.search(error)
+            if hint:
+                delay = float(hint.group(1) or hint.group(2))
+            else:
+                delay = self.cooldown * 2 ** (state.consecutive_limits - 1)
+            state.cooldown_until = time.time() + min(delay, MAX_COOLDOWN)
+            return True
+
+    def next_available_in(self, tokens=0):
+        """Seconds until some key can take a call of about tokens (0 if one is free now)"""
+        now, clock = time.monotonic(), time.time()
+        with self._lock:
+            if not self._states:
+                return 0.0
+            return max(0.0, min(s.wait_time(tokens, now, clock) for s in self._states))
+
+    def health(self):
+        """Per-key status rows; never includes the key itself"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "key": s.label,
+                    "status": "cooling down" if s.cooldown_until > now else "healthy",
+                    "cooldown_remaining": round(max(0.0, s.cooldown_until - now), 1),
+                    "successes": s.successes,
+                    "failures": s.failures,
+                    "rate_limits": s.rate_limits,
+                    "throttled": s.throttled,
+                    "last_error": s.last_error,
+                }
+                for s in self._states
+            ]
+
+
+_key_pool = None
+_key_pool_lock = threading.Lock()
+
+
+def get_key_pool():
+    """Returns the process-wide key pool, loading keys from secrets on first use.
+
+    Backends that need no real keys (the local stand-in) supply their own.
+    """
+    global _key_pool
+    with _key_pool_lock:
+        # Retry loading while empty so keys added to secrets are picked up without a restart
+        if _key_pool is None or not len(_key_pool):
+            _key_pool = KeyPool(
+                load_api_keys() or get_llm_backend().default_keys(),
+                strategy=get_secret("KEY_POOL_STRATEGY", "round_robin"),
+                cooldown=float(get_secret("KEY_COOLDOWN_SECONDS", 60)),
+                rpm=float(get_secret("KEY_RPM", 10)),
+                tpm=float(get_secret("KEY_TPM", 250000)),
+                max_wait=float(get_secret("KEY_MAX_WAIT_SECONDS", 10)),
+            )
+        return _key_pool
@@ -0,0 +1,200 @@
+"""LLM backends for plan text and timetable extraction.
+
+The app talks to an LLMBackend rather than to google.generativeai, so the
+provider can be swapped. The "local" backend needs no network or real keys
+and is used for load tests and offline runs.
+"""
+import os
+import random
+import threading
+import time
+
+from src.model_registry import get_model
+from src.utils import get_secret
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+
+class LLMBackend:
+    """Interface every backend implements.
+
+    Errors are raised as exceptions whose message contains "429" or "quota"
+    when the key is rate limited, so the key pool can bench it.
+    """
+
+    name = None
+
+    def default_keys(self):
+        """Keys to use when none are configured (backends that need real keys return none)"""
+        return []
+
+    def generate_text(self, api_key, prompt, stream=False, **generation_config):
+        """Returns the completion, or an iterator of text chunks when stream is True"""
+        raise NotImplementedError
+
+    def extract_table(self, api_key, prompt, data, mime_type):
+        """Sends an image/PDF with the prompt and returns the text reply"""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini through the per-key model registry"""
+
+    name = "gemini"
+
+    def generate_text(self, api_key, prompt, stream=False, **generation_config):
+        response = get_model(api_key).generate_content(
+            prompt, safety_settings=SAFETY_SETTINGS, generation_config=generation_config, stream=stream
+        )
+        if not stream:
+            return response.text
+        return self._chunks(response)
+
+    @staticmethod
+    def _chunks(response):
+        for chunk in response:
+            # The closing chunk only carries the finish reason
+            if not chunk.candidates or not chunk.candidates[0].content.parts:
+                continue
+            yield chunk.text
+
+    def extract_table(self, api_key, prompt, data, mime_type):
+        response = get_model(api_key).generate_content([prompt, {"mime_type": mime_type, "data": data}])
+        return response.text
+
+
+LOCAL_PLAN_TEXT = """## 🎯 Focus Plan
+
+**0-10 min - Warm up:** Skim your notes and list three questions you can't answer yet.
+
+**10-35 min - Deep work:** Work through the core concept with two worked examples, then
+one problem from the textbook without looking at the solution.
+
+**35-50 min - Active recall:** Close everything and write down the key definitions and steps.
+
+**50-60 min - Review:** Check your answers, mark the gaps and plan tomorrow's first task.
+
+> 💡 Tip: put your phone in another room for the deep-work block.
+"""
+
+LOCAL_TIMETABLE_CSV = """```csv
+Day,Time,Subject,Duration
+Monday,09:00 AM,Data Structures,60
+Monday,11:00 AM,Calculus II,60
+Tuesday,10:00 AM,Physics,90
+Wednesday,02:00 PM,Python Lab,120
+Thursday,09:00 AM,Digital Logic,60
+Friday,01:00 PM,Technical Writing,60
+```"""
+
+
+class LocalRateLimitError(Exception):
+    """Worded like the Gemini 429, so the key pool handles it the same way"""
+
+
+class LocalBackend(LLMBackend):
+    """In-process stand-in that answers with canned text after a tunable delay.
+
+    latency is the mean seconds per call and jitter its relative spread.
+    rate_limit_ratio is the share of calls that fail with a 429 carrying a
+    retry_after hint. Seeded, so runs are repeatable.
+    """
+
+    name = "local"
+
+    def __init__(self, latency=0.5, jitter=0.2, rate_limit_ratio=0.0, retry_after=0.2, keys=4, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.keys = keys
+        self.calls = 0
+        self.rate_limits = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def default_keys(self):
+        return [f"local-key-{i}" for i in range(1, self.keys + 1)]
+
+    def _wait_or_fail(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._random.gauss(self.latency, self.latency * self.jitter))
+            limited = self._random.random() < self.rate_limit_ratio
+            if limited:
+                self.rate_limits += 1
+        return delay, limited
+
+    def _raise_rate_limit(self):
+        raise LocalRateLimitError(
+            f"429 Resource has been exhausted (e.g. check quota). Please retry in {self.retry_after}s."
+        )
+
+    def generate_text(self, api_key, prompt, stream=False, **generation_config):
+        delay, limited = self._wait_or_fail()
+        if not stream:
+            time.sleep(delay)
+            if limited:
+                self._raise_rate_limit()
+            return LOCAL_PLAN_TEXT
+        return self._stream(delay, limited)
+
+    def _stream(self, delay, limited, chunk_size=80):
+        # Half the delay before the first token, the rest spread over the chunks
+        time.sleep(delay / 2)
+        if limited:
+            self._raise_rate_limit()
+        chunks = [LOCAL_PLAN_TEXT[i:i + chunk_size] for i in range(0, len(LOCAL_PLAN_TEXT), chunk_size)]
+        for chunk in chunks:
+            time.sleep(delay / 2 / len(chunks))
+            yield chunk
+
+    def extract_table(self, api_key, prompt, data, mime_type):
+        delay, limited = self._wait_or_fail()
+        time.sleep(delay)
+        if limited:
+            self._raise_rate_limit()
+        return LOCAL_TIMETABLE_CSV
+
+
+def _setting(name, default):
+    """NEURALPLAN_<name> environment variable, then secrets, then default"""
+    return os.environ.get(f"NEURALPLAN_{name}") or get_secret(name, default)
+
+
+def create_backend(name):
+    if name == "gemini":
+        return GeminiBackend()
+    if name == "local":
+        return LocalBackend(
+            latency=float(_setting("LOCAL_LLM_LATENCY_SECONDS", 0.5)),
+            rate_limit_ratio=float(_setting("LOCAL_LLM_RATE_LIMIT_RATIO", 0)),
+            keys=int(_setting("LOCAL_LLM_KEYS", 4)),
+        )
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_llm_backend():
+    """Returns the process-wide backend chosen by LLM_BACKEND ("gemini" or "local")"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(_setting("LLM_BACKEND", "gemini"))
+        return _backend
+
+
+def set_llm_backend(backend):
+    """Replaces the process-wide backend (benchmarks, tests)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+    return backend
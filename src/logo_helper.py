@@ -1,17 +1,20 @@
 """Logo helper for sidebar display"""
-import base64
-from pathlib import Path
+from src.assets import get_base64
+
+_logo_html = (None, None)
 
 def get_logo_base64():
-    """Loads logo as base64 string"""
-    logo_path = Path(__file__).parent.parent / "assets" / "logo.png"
-    with open(logo_path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
+    """Loads logo as base64 string (cached until logo.png changes)"""
+    return get_base64("logo.png")
 
 def get_logo_html():
     """Returns clickable logo HTML for sidebar"""
+    global _logo_html
     logo_b64 = get_logo_base64()
-    return f"""
+    # Same cached string object until the logo changes, so skip re-formatting ~1MB of HTML
+    if _logo_html[0] is logo_b64:
+        return _logo_html[1]
+    html = f"""
     <a href="/" target="_self" style="text-decoration: none;">
         <div style="text-align: center; padding: 1rem 0; margin-bottom: 1rem;">
             <img src="data:image/png;base64,{logo_b64}" alt="Neural Plan Logo" 
@@ -22,3 +25,5 @@ def get_logo_html():
         </div>
     </a>
     """
+    _logo_html = (logo_b64, html)
+    return html
@@ -0,0 +1,54 @@
+"""Per-key Gemini model registry, built once per process and shared by all sessions"""
+import threading
+
+MODEL_NAME = "gemini-flash-latest"
+
+
+class ModelRegistry:
+    """Hands out ready-made GenerativeModel objects, one per API key.
+
+    Each model owns a GenerativeServiceClient created with its key, so the gRPC
+    channel is reused across calls and concurrent sessions never touch the
+    global genai.configure state.
+    """
+
+    def __init__(self, model_name=MODEL_NAME):
+        self.model_name = model_name
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key):
+        model = self._models.get(api_key)
+        if model is not None:
+            return model
+        with self._lock:
+            if api_key not in self._models:
+                # Imported here: google.generativeai takes over a second to import
+                import google.generativeai as genai
+                from google.ai import generativelanguage as glm
+                model = genai.GenerativeModel(self.model_name)
+                # Bind the client up front; otherwise the model falls back to the global default client
+                model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+                self._models[api_key] = model
+            return self._models[api_key]
+
+    def __len__(self):
+        return len(self._models)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """Returns the process-wide model registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+
+def get_model(api_key):
+    """Shortcut for get_model_registry().get(api_key)"""
+    return get_model_registry().get(api_key)
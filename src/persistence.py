@@ -0,0 +1,115 @@
+"""Crash-safe, lock-protected file writes shared by every CSV persistence path"""
+import contextlib
+import csv
+import os
+import tempfile
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows - fall back to unlocked (still atomic) writes
+    fcntl = None
+
+
+class StaleWriteError(Exception):
+    """Raised when a file changed between the read and the write that depends on it"""
+
+
+@contextlib.contextmanager
+def file_lock(path, shared=False):
+    """Advisory lock on a sidecar '<path>.lock' file, held for the duration of the block"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def file_version(path):
+    """Opaque version token; changes whenever the file is replaced or appended to"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def read_csv(path):
+    """Returns (DataFrame or None, version) read under a shared lock"""
+    with file_lock(path, shared=True):
+        version = file_version(path)
+        if version is None:
+            return None, None
+        return pd.read_csv(path), version
+
+
+def _check_version(path, expected_version):
+    if expected_version is not False and file_version(path) != expected_version:
+        raise StaleWriteError(f"{path} was modified by another session")
+
+
+def _fsync_dir(directory):
+    if os.name == "nt":
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _atomic_write_locked(df, path):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            df.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_dir(directory)
+
+
+def atomic_write_csv(df, path, expected_version=False):
+    """Writes df to path via temp file + fsync + rename under an exclusive lock.
+
+    Readers see either the old file or the new one, never a truncated mix.
+    Pass the version returned by read_csv as expected_version to fail with
+    StaleWriteError if someone else wrote the file in between (None means
+    "the file must not exist yet"; the default skips the check).
+    """
+    with file_lock(path):
+        _check_version(path, expected_version)
+        _atomic_write_locked(df, path)
+        return file_version(path)
+
+
+def append_csv_row(path, header, row):
+    """Appends one row (writing the header for a new file) and fsyncs it"""
+    with file_lock(path):
+        new_file = not os.path.exists(path)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(header)
+            writer.writerow(row)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def remove_file(path, expected_version=False):
+    """Deletes path (if present) under the exclusive lock"""
+    with file_lock(path):
+        _check_version(path, expected_version)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,267 @@
+"""Near-duplicate study plan lookup over the plan cache"""
+import json
+import math
+import re
+import threading
+import time
+
+from src.metrics import get_metrics
+from src.utils import get_secret
+
+TIME_BUCKET_MINUTES = 5
+# Same groups as the prompt's tone rules, so a reused plan reads right for the student
+MOOD_BUCKETS = {
+    "Low Battery 😴": "low",
+    "Power Saving 😐": "low",
+    "Normal Mode 🙂": "steady",
+    "Neural Sync 🧘": "steady",
+    "Beast Mode 🦁": "beast",
+}
+# Words that don't change what a plan covers ("Recursion basics" is a recursion plan)
+FILLER_WORDS = frozenset({
+    "a", "an", "and", "the", "of", "to", "in", "on", "for", "with",
+    "basic", "basics", "intro", "introduction", "fundamentals", "overview",
+})
+ROMAN_NUMERALS = {"i": 1, "ii": 2, "iii": 3, "iv": 4, "v": 5, "vi": 6, "vii": 7, "viii": 8, "ix": 9, "x": 10}
+# Course codes such as "cs101" or "math2410b"
+_COURSE_CODE = re.compile(r"[a-z]+\d+[a-z]*|\d+")
+# Upper bound on entries scored per lookup, so a very common focus trigram can't force a long scan
+MAX_CANDIDATES = 128
+# How often refresh() drops plans the cache has evicted or expired since
+PRUNE_SECONDS = 60
+_EMPTY = frozenset({"∅"})
+
+
+def normalize_text(text):
+    """Casefolded words without punctuation or filler words"""
+    words = re.sub(r"[^\w\s]", " ", text.casefold().replace("&", " and ")).split()
+    return " ".join(w for w in words if w not in FILLER_WORDS)
+
+
+def trigrams(text):
+    """Character trigrams of the normalized text, padded so word edges count"""
+    if not text:
+        return _EMPTY
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def numbers(text):
+    """Numbers, Roman numerals and course codes in normalized text ("Calculus II" -> {"2"})"""
+    found = set()
+    for word in text.split():
+        if word in ROMAN_NUMERALS:
+            found.add(str(ROMAN_NUMERALS[word]))
+        elif _COURSE_CODE.fullmatch(word):
+            found.add(str(int(word)) if word.isdigit() else word)
+    return frozenset(found)
+
+
+def subject_key(text):
+    """Subjects only match when their words are the same ("Organic" is not "Inorganic" Chemistry)"""
+    return tuple(sorted({str(ROMAN_NUMERALS.get(word, word)) for word in text.split()}))
+
+
+def plan_bucket(inputs):
+    """Plans are only reused within the same time step, mood group and difficulty level"""
+    confidence = inputs["confidence"]
+    # Thresholds match the prompt's beginner/intermediate/advanced split
+    level = 0 if confidence <= 3 else 1 if confidence <= 6 else 2
+    return (
+        round(inputs["time_available"] / TIME_BUCKET_MINUTES),
+        MOOD_BUCKETS.get(inputs["mood"], "steady"),
+        level,
+    )
+
+
+def _dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class PlanIndex:
+    """Inverted focus-trigram index over cached plan inputs.
+
+    Plans are grouped by plan_bucket and subject words, which must match
+    exactly (so do numbers and numerals in the subject and the focus). Only
+    the focus is fuzzy: its score is the Dice similarity of the trigrams.
+    Lookups use prefix filtering: a match above the threshold must share at
+    least one of the query's rarest focus trigrams, so only those posting
+    lists are read, and at most MAX_CANDIDATES plans are scored.
+
+    Plans the cache no longer has are dropped by refresh(); once dropped
+    entries outnumber live ones the index is rebuilt, so it stays the size
+    of the cache.
+    """
+
+    def __init__(self, threshold=0.9):
+        self.threshold = threshold
+        self._entries = []      # id -> (key, focus numbers, focus grams, group, focus), None once dropped
+        self._ids = {}          # cache key -> id
+        self._signatures = {}   # (group number, focus) -> id
+        self._groups = {}       # (plan_bucket, subject words) -> small int, so posting keys hash cheaply
+        self._postings = {}     # (group number, focus trigram) -> [id, ...]
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self.last_rowid = 0
+        self.last_prune = time.monotonic()
+        self.lookups = 0
+        self.matches = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    @staticmethod
+    def _features(inputs):
+        focus = normalize_text(inputs.get("focus_topic") or "")
+        group = (plan_bucket(inputs), subject_key(normalize_text(inputs["subject"])))
+        return group, focus, numbers(focus), trigrams(focus)
+
+    def add(self, key, inputs):
+        group, focus, focus_numbers, focus_grams = self._features(inputs)
+        with self._lock:
+            if key not in self._ids:
+                self._insert((key, focus_numbers, focus_grams, group, focus))
+
+    def _insert(self, entry):
+        key, _, focus_grams, group, focus = entry
+        number = self._groups.setdefault(group, len(self._groups))
+        # Plans whose inputs normalize the same are interchangeable; keep the newest
+        previous = self._signatures.get((number, focus))
+        if previous is not None:
+            self._drop(previous)
+        entry_id = len(self._entries)
+        self._entries.append(entry)
+        self._ids[key] = entry_id
+        self._signatures[(number, focus)] = entry_id
+        postings = self._postings
+        for gram in focus_grams:
+            posting = postings.get((number, gram))
+            if posting is None:
+                postings[(number, gram)] = [entry_id]
+            else:
+                posting.append(entry_id)
+
+    def discard(self, key):
+        """Forgets a plan, e.g. one the cache has since evicted"""
+        with self._lock:
+            entry_id = self._ids.get(key)
+            if entry_id is not None:
+                self._drop(entry_id)
+
+    def _drop(self, entry_id):
+        # Posting lists keep the id until the next rebuild; lookups skip dropped entries
+        key, _, _, group, focus = self._entries[entry_id]
+        self._entries[entry_id] = None
+        del self._ids[key]
+        signature = (self._groups[group], focus)
+        if self._signatures.get(signature) == entry_id:
+            del self._signatures[signature]
+        self._dropped += 1
+
+    def prune(self, live_keys):
+        """Drops every plan not in live_keys, then rebuilds if most entries are dead"""
+        with self._lock:
+            for key in [key for key in self._ids if key not in live_keys]:
+                self._drop(self._ids[key])
+            if self._dropped > len(self._ids):
+                live = [entry for entry in self._entries if entry is not None]
+                self._entries, self._ids, self._signatures, self._groups, self._postings = [], {}, {}, {}, {}
+                self._dropped = 0
+                for entry in live:
+                    self._insert(entry)
+
+    def find(self, inputs):
+        """Returns (cache key, score) of the closest plan at or above the threshold, or None"""
+        group, focus, query_numbers, focus_grams = self._features(inputs)
+        size = len(focus_grams)
+        # Dice >= threshold means sharing at least this many trigrams, and a similar trigram count
+        required = math.ceil(self.threshold * size / 2)
+        min_size, max_size = size * self.threshold / (2 - self.threshold), size * (2 - self.threshold) / self.threshold
+        best, best_score = None, self.threshold
+        with self._lock:
+            self.lookups += 1
+            number = self._groups.get(group)
+            if number is None:
+                return None
+            exact = self._signatures.get((number, focus))
+            if exact is not None:
+                self.matches += 1
+                return self._entries[exact][0], 1.0
+            postings = [self._postings.get((number, gram), ()) for gram in focus_grams]
+            postings.sort(key=len)
+            seen = set()
+            for posting in postings[:max(1, len(focus_grams) - required + 1)]:
+                for entry_id in posting:
+                    if entry_id in seen:
+                        continue
+                    if len(seen) >= MAX_CANDIDATES:
+                        break
+                    seen.add(entry_id)
+                    entry = self._entries[entry_id]
+                    if entry is None or entry[1] != query_numbers or not min_size <= len(entry[2]) <= max_size:
+                        continue
+                    score = _dice(focus_grams, entry[2])
+                    if score >= best_score:
+                        best, best_score = entry[0], score
+            if best is None:
+                return None
+            self.matches += 1
+            return best, round(best_score, 3)
+
+    def refresh(self, cache):
+        """Indexes plans added to the cache (by any replica) since the last refresh.
+
+        Every PRUNE_SECONDS it also drops plans the cache has evicted or expired.
+        """
+        if time.monotonic() - self.last_prune >= PRUNE_SECONDS:
+            self.last_prune = time.monotonic()
+            self.prune(cache.plan_keys())
+        for rowid, key, meta in cache.plan_rows(after_rowid=self.last_rowid):
+            self.last_rowid = max(self.last_rowid, rowid)
+            try:
+                inputs = json.loads(meta)
+            except (TypeError, ValueError):
+                continue
+            if inputs.get("prompt_version") == cache.version:
+                self.add(key, inputs)
+
+    def stats(self):
+        return {"entries": len(self), "dropped": self._dropped, "lookups": self.lookups, "matches": self.matches, "threshold": self.threshold}
+
+
+_plan_index = None
+_plan_index_lock = threading.Lock()
+
+
+def get_plan_index():
+    """Returns the process-wide similarity index, or None when PLAN_SIMILARITY_THRESHOLD is 0"""
+    global _plan_index
+    with _plan_index_lock:
+        if _plan_index is None:
+            threshold = float(get_secret("PLAN_SIMILARITY_THRESHOLD", 0.9))
+            if threshold <= 0:
+                return None
+            _plan_index = PlanIndex(threshold)
+        return _plan_index
+
+
+def find_similar_plan(cache, inputs):
+    """A cached plan written for near-identical inputs, or None.
+
+    Runs after the exact lookup already counted a miss, so it reads without
+    touching the cache's hit rate and counts plan_cache_similar_hit_total instead.
+    """
+    index = get_plan_index()
+    if index is None:
+        return None
+    # Cheap (a rowid range scan), and picks up the plan a student saved a moment ago
+    index.refresh(cache)
+    match = index.find(inputs)
+    if match is None:
+        return None
+    plan = cache.peek(match[0])
+    if plan is None:
+        index.discard(match[0])
+    else:
+        get_metrics().inc("plan_cache_similar_hit_total")
+    return plan
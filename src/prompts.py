@@ -0,0 +1,110 @@
+"""Versioned study-plan prompt and the output budget that goes with it"""
+
+# Bump whenever the template or budget rules change; it is part of the plan cache key
+PROMPT_VERSION = "plan-v2"
+
+MOOD_MAPPING = {
+    "Low Battery 😴": "extremely low energy, can barely focus",
+    "Power Saving 😐": "low energy, needs easy material",
+    "Normal Mode 🙂": "moderate energy, can handle normal difficulty",
+    "Neural Sync 🧘": "high energy, ready for challenging work",
+    "Beast Mode 🦁": "peak performance, tackle hardest material"
+}
+
+# Low-energy students get shorter plans; peak-energy ones a little more detail
+MOOD_BUDGET_FACTOR = {
+    "Low Battery 😴": 0.7,
+    "Power Saving 😐": 0.85,
+    "Normal Mode 🙂": 1.0,
+    "Neural Sync 🧘": 1.1,
+    "Beast Mode 🦁": 1.2,
+}
+
+TEMPERATURE = 0.7
+BASE_OUTPUT_TOKENS = 200
+TOKENS_PER_BLOCK = 70
+MAX_OUTPUT_TOKENS = 2048
+# The cap also covers any model-side reasoning tokens, so it sits well above the target length
+OUTPUT_HEADROOM_TOKENS = 512
+
+PLAN_TEMPLATE = """You are an academic coach. A class was cancelled; plan the student's free time.
+
+Student: {time_available} min free, subject: {subject}, energy: {energy}, knowledge: {confidence}/10.
+Focus: {focus}
+Level: {difficulty}
+Tone: {tone}
+
+Rules:
+- Cover exactly {time_available} min in {blocks} blocks of about {block_minutes} min ("0-{block_minutes} min: ...").
+- Low energy: passive work (videos, summaries, notes). High energy: active work (problems, code, practice).
+- Name specific resources.{break_rule}
+- Markdown: one "## Your {time_available}-Minute {subject} Sprint" header, a one-line personal note, then a "### 📍" header per block with at most {bullets} short bullets.
+- Stay under {word_budget} words. Don't ask follow-up questions."""
+
+
+def block_minutes(time_available):
+    """Plan granularity: short sessions get fine-grained blocks, long ones coarse blocks"""
+    if time_available <= 30:
+        return 5
+    if time_available <= 60:
+        return 10
+    if time_available <= 120:
+        return 15
+    return 30
+
+
+def plan_budget(time_available, mood):
+    """Block size, block count, target length and output-token cap for a plan.
+
+    The prompt asks for target_tokens worth of words, which is what sets
+    latency. max_output_tokens only stops runaway answers.
+    """
+    minutes = block_minutes(time_available)
+    blocks = max(1, -(-time_available // minutes))
+    target = int((BASE_OUTPUT_TOKENS + TOKENS_PER_BLOCK * blocks) * MOOD_BUDGET_FACTOR.get(mood, 1.0))
+    return {
+        "block_minutes": minutes,
+        "blocks": blocks,
+        "bullets": 2 if blocks > 6 else 3,
+        "target_tokens": target,
+        "max_output_tokens": min(int(target * 1.5) + OUTPUT_HEADROOM_TOKENS, MAX_OUTPUT_TOKENS),
+    }
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English prose)"""
+    return max(1, len(text) // 4)
+
+
+def build_plan_prompt(subject, time_available, mood, focus_topic, confidence):
+    """Returns (prompt, generation_config) for already-normalized plan inputs"""
+    budget = plan_budget(time_available, mood)
+    if confidence <= 3:
+        difficulty = "complete beginner - simple language, analogies, step by step."
+    elif confidence <= 6:
+        difficulty = "intermediate - fill gaps and reinforce fundamentals."
+    else:
+        difficulty = "advanced - challenging problems, edge cases, deep questions."
+    if "Beast Mode" in mood:
+        tone = "aggressive, no-excuses drill sergeant."
+    elif "Low Battery" in mood or "Power Saving" in mood:
+        tone = "very simple sentences, gentle and encouraging."
+    else:
+        tone = "clear, helpful and motivating."
+    prompt = PLAN_TEMPLATE.format(
+        subject=subject,
+        time_available=time_available,
+        energy=MOOD_MAPPING.get(mood, "moderate energy"),
+        confidence=confidence,
+        focus=f"make {focus_topic} the primary focus." if focus_topic else "comprehensive review of the subject.",
+        difficulty=difficulty,
+        tone=tone,
+        blocks=budget["blocks"],
+        block_minutes=budget["block_minutes"],
+        bullets=budget["bullets"],
+        break_rule="\n- Include a 5-minute break." if time_available > 60 else "",
+        # ~0.75 words per token
+        word_budget=int(budget["target_tokens"] * 0.75),
+    )
+    generation_config = {"max_output_tokens": budget["max_output_tokens"], "temperature": TEMPERATURE}
+    return prompt, generation_config
@@ -0,0 +1,71 @@
+"""Midnight rollover of every user's daily status, run off the request path"""
+import datetime
+import logging
+import threading
+
+from src.storage import get_storage, list_user_ids
+from src.utils import get_secret
+
+logger = logging.getLogger(__name__)
+
+
+def rollover_all(today=None):
+    """Archives every daily state left over from before today; returns how many were rolled over"""
+    today = today or datetime.date.today()
+    rolled = 0
+    for user_id in list_user_ids():
+        try:
+            rolled += get_storage(user_id).rollover(today)
+        except Exception:
+            # One user's broken data must not stop everyone else's reset
+            logger.exception("Daily rollover failed for %s", user_id)
+    return rolled
+
+
+def seconds_until_midnight(now=None):
+    now = now or datetime.datetime.now()
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    return (midnight - now).total_seconds()
+
+
+class RolloverWorker(threading.Thread):
+    """Daemon thread that runs rollover_all at startup and just after each midnight.
+
+    It also wakes at least every check_interval seconds, so a clock change or
+    a suspended host can't make it skip a day. Every replica can run one:
+    a day already rolled over elsewhere is a no-op.
+    """
+
+    def __init__(self, check_interval=300):
+        super().__init__(name="daily-rollover", daemon=True)
+        self.check_interval = check_interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                rolled = rollover_all()
+                if rolled:
+                    logger.info("Rolled over %d daily states", rolled)
+            except Exception:
+                # e.g. "database is locked" while listing users; nothing restarts this thread, so retry next wake-up
+                logger.exception("Daily rollover pass failed")
+            # A second past midnight so today() has already moved on
+            self.stopped.wait(min(seconds_until_midnight() + 1, self.check_interval))
+
+    def stop(self):
+        self.stopped.set()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_rollover_worker():
+    """Starts the process-wide worker on first call; later calls are free"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = RolloverWorker(check_interval=float(get_secret("ROLLOVER_CHECK_SECONDS", 300)))
+            _worker.start()
+    return _worker
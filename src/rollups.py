@@ -0,0 +1,74 @@
+"""Daily, weekly and monthly history aggregates behind the Insights ranges"""
+import datetime
+
+import pandas as pd
+
+PERIODS = ("day", "week", "month")
+ROLLUP_COLUMNS = ["Date", "Time_Saved", "Time_Used", "Efficiency", "Classes_Cancelled", "Days"]
+
+# Insights range selector -> days back (None = all time)
+HISTORY_RANGES = {
+    "7 Days": 7,
+    "30 Days": 30,
+    "90 Days": 90,
+    "365 Days": 365,
+    "All Time": None,
+}
+
+# Charts switch to coarser periods rather than draw more than this many points
+MAX_CHART_POINTS = 60
+
+
+def period_start(date, period):
+    """First day of the day/week (Monday)/month containing date"""
+    if period == "day":
+        return date
+    if period == "week":
+        return date - datetime.timedelta(days=date.weekday())
+    if period == "month":
+        return date.replace(day=1)
+    raise ValueError(f"Unknown rollup period: {period}")
+
+
+def period_for_span(days):
+    """Finest period that keeps a chart over this many days under MAX_CHART_POINTS"""
+    if days <= MAX_CHART_POINTS:
+        return "day"
+    if days <= MAX_CHART_POINTS * 7:
+        return "week"
+    return "month"
+
+
+def compute_rollups(history_df, period, since=None):
+    """Aggregates raw history into one row per period.
+
+    Efficiency is the mean of the daily efficiencies in the period and Days the
+    number of history rows behind it (needed to combine periods correctly).
+    """
+    if history_df is None or history_df.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    df = history_df.copy()
+    dates = pd.to_datetime(df["Date"]).dt.date
+    df["Date"] = dates.map(lambda d: period_start(d, period))
+    if since is not None:
+        df = df[df["Date"] >= period_start(since, period)]
+    rollups = df.groupby("Date", as_index=False).agg(
+        Time_Saved=("Time_Saved", "sum"),
+        Time_Used=("Time_Used", "sum"),
+        Efficiency=("Efficiency", "mean"),
+        Classes_Cancelled=("Classes_Cancelled", "sum"),
+        Days=("Efficiency", "size"),
+    )
+    rollups["Date"] = rollups["Date"].astype(str)
+    return rollups[ROLLUP_COLUMNS]
+
+
+def lifetime_totals(rollups_df):
+    """Sums a rollup frame into lifetime totals and the mean daily efficiency"""
+    days = rollups_df["Days"].sum()
+    return {
+        "time_saved": rollups_df["Time_Saved"].sum(),
+        "time_used": rollups_df["Time_Used"].sum(),
+        "efficiency": (rollups_df["Efficiency"] * rollups_df["Days"]).sum() / days if days else 0,
+        "days": days,
+    }
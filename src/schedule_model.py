@@ -0,0 +1,72 @@
+"""Typed schedule frames and the metrics every page reads from them"""
+import numpy as np
+import pandas as pd
+
+from src.timetable_import import DAYS
+
+STATUSES = ["Active", "Cancelled"]
+
+
+def _categorical(series, categories):
+    """Categorical over the known values, keeping any unexpected ones as extra categories"""
+    extra = [v for v in pd.unique(series.dropna().astype(str)) if v not in categories]
+    return pd.Categorical(series, categories=[*categories, *extra])
+
+
+def normalize_schedule(df):
+    """Returns a typed copy of a schedule.
+
+    Day and Status become categoricals, Duration and Actual_Study int32
+    minutes, and missing tracking columns are filled in. Subject and Time
+    stay strings because the schedule editor lets students type new values.
+    """
+    df = df.drop(columns=["Date"], errors="ignore").copy()
+    for column, default in (("Status", "Active"), ("Actual_Study", 0), ("Custom_Subject", "")):
+        if column not in df.columns:
+            df[column] = default
+    df["Day"] = _categorical(df["Day"], DAYS)
+    df["Status"] = _categorical(df["Status"].fillna("Active"), STATUSES)
+    for column in ("Duration", "Actual_Study"):
+        df[column] = pd.to_numeric(df[column], errors="coerce").fillna(0).astype("int32")
+    df["Custom_Subject"] = df["Custom_Subject"].fillna("").astype(str)
+    return df
+
+
+def has_progress(df):
+    """True once anything was tracked: a cancellation, study minutes or a custom subject"""
+    return bool(
+        (df["Status"].astype(str) == "Cancelled").any()
+        or (pd.to_numeric(df.get("Actual_Study", 0), errors="coerce").fillna(0) > 0).any()
+        or (df.get("Custom_Subject", pd.Series(dtype=str)).fillna("").astype(str) != "").any()
+    )
+
+
+def schedule_metrics(df):
+    """Every count and minute total the pages show, in one vectorized pass.
+
+    Returns total/active/cancelled class counts, free_minutes (cancelled
+    durations), studied_minutes (Actual_Study logged against them) and
+    efficiency (studied as a whole percentage of free).
+    """
+    codes = pd.Categorical(df["Status"], categories=STATUSES).codes
+    known = codes >= 0
+    codes = codes[known]
+    duration = pd.to_numeric(df["Duration"], errors="coerce").fillna(0).to_numpy()[known]
+    if "Actual_Study" in df.columns:
+        actual = pd.to_numeric(df["Actual_Study"], errors="coerce").fillna(0).to_numpy()[known]
+    else:
+        actual = np.zeros(len(codes))
+    counts = np.bincount(codes, minlength=len(STATUSES))
+    minutes = np.bincount(codes, weights=duration, minlength=len(STATUSES))
+    studied = np.bincount(codes, weights=actual, minlength=len(STATUSES))
+    cancelled = STATUSES.index("Cancelled")
+    free_minutes = int(minutes[cancelled])
+    studied_minutes = int(studied[cancelled])
+    return {
+        "total": len(df),
+        "active": int(counts[STATUSES.index("Active")]),
+        "cancelled": int(counts[cancelled]),
+        "free_minutes": free_minutes,
+        "studied_minutes": studied_minutes,
+        "efficiency": int(studied_minutes / free_minutes * 100) if free_minutes > 0 else 0,
+    }
@@ -0,0 +1,108 @@
+"""Per-user session bootstrap shared by the app and every page"""
+import datetime
+import re
+
+import pandas as pd
+import streamlit as st
+
+from src.persistence import StaleWriteError
+from src.rollover import start_rollover_worker
+from src.schedule_model import normalize_schedule
+from src.storage import DEFAULT_USER, get_storage
+
+DEFAULT_SCHEDULE_FILE = "data/default_schedule.csv"
+STALE_SAVE_MESSAGE = (
+    "⚠️ Not saved: today's status was changed in another tab or device since this page loaded. "
+    "Reload the page to get the latest version, then retry your changes."
+)
+_INVALID_USER_CHARS = re.compile(r"[^a-z0-9_-]")
+
+
+def normalize_user_id(raw):
+    """Lowercase letters, digits, '-' and '_' only (it becomes a path/namespace)"""
+    user_id = _INVALID_USER_CHARS.sub("", str(raw).strip().lower())[:40]
+    return user_id or DEFAULT_USER
+
+
+def get_user_id():
+    """Current user's namespace, taken from ?user= on first load"""
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = normalize_user_id(st.query_params.get("user", DEFAULT_USER))
+    return st.session_state.user_id
+
+
+def get_user_storage():
+    return get_storage(get_user_id())
+
+
+def clear_session(keep=("user_id",)):
+    """Drops session state except the keys in keep"""
+    for key in list(st.session_state.keys()):
+        if key not in keep:
+            del st.session_state[key]
+
+
+def switch_user(raw):
+    """Switches namespaces; the new user's data loads lazily on the next run"""
+    user_id = normalize_user_id(raw)
+    if user_id == get_user_id():
+        return False
+    clear_session(keep=())
+    st.session_state.user_id = user_id
+    st.query_params["user"] = user_id
+    return True
+
+
+def ensure_schedule():
+    """Loads the user's schedule into session state on first access.
+    
+    Today's progress wins over the saved timetable, which wins over the sample data.
+    A session left open past midnight reloads. Yesterday's progress is skipped
+    here and archived by the background rollover worker.
+    """
+    start_rollover_worker()
+    today = datetime.date.today()
+    if st.session_state.get('schedule_date') != today:
+        st.session_state.pop('schedule', None)
+    if 'schedule' in st.session_state:
+        return st.session_state.schedule
+    
+    storage = get_user_storage()
+    daily_date = storage.daily_state_date()
+    # The version is kept even for a stale or missing daily state, so saving over it is checked too
+    daily_df, st.session_state.daily_version = storage.read_daily_state()
+    if daily_date is None or daily_date < today:
+        daily_df = None
+    master_df = storage.load_schedule() if daily_df is None else None
+    
+    # Load today's progress if it exists
+    if daily_df is not None:
+        df = daily_df
+    else:
+        df = master_df if master_df is not None else pd.read_csv(DEFAULT_SCHEDULE_FILE)
+        df["Status"] = "Active"
+        df["Actual_Study"] = 0
+        df["Custom_Subject"] = ""
+    
+    # Typed columns (also drops any stray Date column)
+    df = normalize_schedule(df)
+    
+    st.session_state.schedule = df
+    st.session_state.schedule_date = today
+    return df
+
+
+def save_daily_state(df, overwrite=False):
+    """Saves today's progress and makes df the session's schedule.
+
+    Raises StaleWriteError if another tab or replica saved since this session
+    loaded it; the session then reloads the latest copy on the next run.
+    overwrite=True skips the check (fresh imports and resets).
+    """
+    expected = False if overwrite else st.session_state.get("daily_version", False)
+    try:
+        st.session_state.daily_version = get_user_storage().save_daily_state(df, expected_version=expected)
+    except StaleWriteError:
+        st.session_state.pop("schedule", None)
+        raise
+    st.session_state.schedule = df
@@ -0,0 +1,57 @@
+"""Coalesces identical in-flight requests so only one of them reaches the API"""
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome.
+
+    The first caller for a key becomes the leader and does the work. Callers
+    that arrive while it is running wait for the same result instead of
+    starting their own call. Nothing is remembered once the call finishes;
+    the plan cache covers repeats after that.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def begin(self, key):
+        """Returns (call, is_leader). A leader must pass the call to finish() when done."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.followers += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self.leaders += 1
+            return call, True
+
+    def finish(self, key, call, result=None, error=None):
+        """Publishes the leader's outcome and wakes every follower"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result, call.error = result, error
+        call.done.set()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {"in_flight": in_flight, "leaders": self.leaders, "followers": self.followers}
+
+
+_plan_flights = SingleFlight()
+
+
+def get_plan_flights():
+    """Returns the process-wide single-flight group for study plans"""
+    return _plan_flights
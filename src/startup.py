@@ -0,0 +1,76 @@
+"""Cold-start import timing.
+
+Set NEURALPLAN_IMPORT_TIMING=1 to record every first-time import made by the
+running app, or run ``python -m src.startup [modules...]`` for a report from a
+fresh interpreter (defaults to the modules the pages depend on).
+"""
+import builtins
+import os
+import sys
+import threading
+import time
+
+DEFAULT_MODULES = [
+    "streamlit",
+    "pandas",
+    "src.gemini_client",
+    "src.storage",
+    "src.session",
+    "streamlit_lottie",
+    "plotly.express",
+    "google.generativeai",
+]
+
+_original_import = builtins.__import__
+_records = {}
+_stack = []
+_installed = False
+_lock = threading.RLock()
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Relative and already-loaded imports are dictionary lookups - not worth timing
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    with _lock:
+        _stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return _original_import(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - start
+            child_time = _stack.pop()
+            if _stack:
+                _stack[-1] += total
+            if name not in _records:
+                _records[name] = {"module": name, "self_ms": (total - child_time) * 1000, "total_ms": total * 1000}
+
+
+def install_import_timer():
+    """Starts recording import times (idempotent)"""
+    global _installed
+    if not _installed:
+        builtins.__import__ = _timed_import
+        _installed = True
+
+
+def import_report(top=20):
+    """Slowest recorded imports, by cumulative time (includes nested imports)"""
+    rows = sorted(_records.values(), key=lambda r: r["total_ms"], reverse=True)
+    return [{**r, "self_ms": round(r["self_ms"], 1), "total_ms": round(r["total_ms"], 1)} for r in rows[:top]]
+
+
+if os.environ.get("NEURALPLAN_IMPORT_TIMING") == "1":
+    install_import_timer()
+
+
+if __name__ == "__main__":
+    install_import_timer()
+    started = time.perf_counter()
+    for module in sys.argv[1:] or DEFAULT_MODULES:
+        __import__(module)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{'module':<45}{'self ms':>10}{'total ms':>10}")
+    for row in import_report():
+        print(f"{row['module']:<45}{row['self_ms']:>10}{row['total_ms']:>10}")
+    print(f"\nCold import of {len(sys.argv[1:]) or len(DEFAULT_MODULES)} modules: {elapsed:.0f} ms")
@@ -0,0 +1,615 @@
+"""Pluggable persistence for schedules, daily status and history"""
+import datetime
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.history_log import HISTORY_COLUMNS, HistoryLog
+from src.metrics import get_metrics
+from src.persistence import StaleWriteError, atomic_write_csv, file_lock, read_csv, remove_file
+from src.rollups import PERIODS, ROLLUP_COLUMNS, compute_rollups, period_start
+from src.schedule_model import has_progress, schedule_metrics
+from src.utils import get_secret
+
+DEFAULT_USER = "default"
+SCHEDULE_COLUMNS = ["Day", "Time", "Subject", "Duration", "Status", "Actual_Study", "Custom_Subject"]
+
+# pandas sums/cells come back as numpy scalars, which sqlite3 can't bind by default
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+sqlite3.register_adapter(np.bool_, bool)
+
+
+class Storage:
+    """Interface shared by every storage backend.
+
+    Schedules are DataFrames with SCHEDULE_COLUMNS (the master timetable and
+    today's working copy). History has one row per date with HISTORY_COLUMNS.
+    Loaders return None when nothing has been saved yet.
+
+    read_schedule/read_daily_state also return an opaque version. Passing it
+    back as expected_version makes the save raise StaleWriteError if another
+    session or replica saved in between, instead of silently overwriting it
+    (None means "nothing saved yet"; the default False skips the check).
+    Saves return the new version.
+    """
+
+    backend = None
+
+    def read_schedule(self):
+        """(schedule or None, version)"""
+        raise NotImplementedError
+
+    def load_schedule(self):
+        return self.read_schedule()[0]
+
+    def save_schedule(self, df, expected_version=False):
+        raise NotImplementedError
+
+    def clear_schedule(self):
+        raise NotImplementedError
+
+    def read_daily_state(self):
+        """(daily state or None, version)"""
+        raise NotImplementedError
+
+    def load_daily_state(self):
+        return self.read_daily_state()[0]
+
+    def save_daily_state(self, df, expected_version=False):
+        raise NotImplementedError
+
+    def clear_daily_state(self):
+        raise NotImplementedError
+
+    def daily_state_date(self):
+        """Date the daily state was last saved on, or None if there is none"""
+        raise NotImplementedError
+
+    def archive_daily_state(self, date):
+        """Moves the daily state saved on date into the archive and clears it.
+
+        Returns False without touching anything if the daily state is no longer
+        from date (already rolled over, or saved again since).
+        """
+        raise NotImplementedError
+
+    def rollover(self, today):
+        """Snapshots a daily state left over from an earlier day into history and archives it.
+
+        The pages log history with every save, so an existing row for that day
+        is kept as the student logged it. A missing one is only filled in when
+        the state has progress in it; a fresh import nobody touched would
+        otherwise add a zero-minute day.
+
+        Safe to run repeatedly and from several processes: the history upsert
+        is idempotent and only one archive_daily_state call can win.
+        """
+        date = self.daily_state_date()
+        if date is None or date >= today:
+            return False
+        daily_df = self.load_daily_state()
+        if daily_df is not None and has_progress(daily_df) and not self.has_history(date):
+            metrics = schedule_metrics(daily_df)
+            self.upsert_history(
+                date, metrics["free_minutes"], metrics["studied_minutes"], metrics["efficiency"], metrics["cancelled"]
+            )
+        return self.archive_daily_state(date)
+
+    def load_history(self):
+        raise NotImplementedError
+
+    def upsert_history(self, date, time_saved, time_used, efficiency, classes_cancelled):
+        """Inserts or replaces the history row for date"""
+        raise NotImplementedError
+
+    def has_history(self, date):
+        """True if history already has a row for date"""
+        df = self.load_history()
+        return df is not None and str(date) in set(pd.to_datetime(df["Date"]).dt.date.astype(str))
+
+    def replace_history(self, df):
+        raise NotImplementedError
+
+    def clear_history(self):
+        raise NotImplementedError
+
+    def compact_history(self):
+        """Folds any pending history log into its snapshot (no-op for backends without one)"""
+
+    def load_rollups(self, period, since=None):
+        """History aggregated per day/week/month (see src.rollups), from since onwards.
+
+        The default aggregates the raw history on every call; backends that
+        can keep the aggregates materialized override this.
+        """
+        return compute_rollups(self.load_history(), period, since=since)
+
+    def clear_all(self):
+        self.clear_schedule()
+        self.clear_daily_state()
+        self.clear_history()
+
+
+class CSVStorage(Storage):
+    """The original flat-file layout: user_schedule.csv, daily_state.csv, history.csv.
+
+    History saves append to history_log.csv, which is compacted into
+    history.csv on read (see HistoryLog).
+    """
+
+    backend = "csv"
+
+    def __init__(self, data_dir="data"):
+        self.data_dir = data_dir
+        self.schedule_file = os.path.join(data_dir, "user_schedule.csv")
+        self.daily_file = os.path.join(data_dir, "daily_state.csv")
+        self.archive_dir = os.path.join(data_dir, "daily_archive")
+        self.history_file = os.path.join(data_dir, "history.csv")
+        self.history = HistoryLog(self.history_file, os.path.join(data_dir, "history_log.csv"))
+        os.makedirs(data_dir, exist_ok=True)
+
+    def read_schedule(self):
+        return read_csv(self.schedule_file)
+
+    def save_schedule(self, df, expected_version=False):
+        return atomic_write_csv(df, self.schedule_file, expected_version=expected_version)
+
+    def clear_schedule(self):
+        remove_file(self.schedule_file)
+
+    def read_daily_state(self):
+        return read_csv(self.daily_file)
+
+    def save_daily_state(self, df, expected_version=False):
+        return atomic_write_csv(df, self.daily_file, expected_version=expected_version)
+
+    def clear_daily_state(self):
+        remove_file(self.daily_file)
+
+    def daily_state_date(self):
+        try:
+            return datetime.date.fromtimestamp(os.path.getmtime(self.daily_file))
+        except FileNotFoundError:
+            return None
+
+    def archive_daily_state(self, date):
+        archive_file = os.path.join(self.archive_dir, f"{date}.csv")
+        # Saves wait on this lock, so the file can't change between the check and the removal
+        with file_lock(self.daily_file):
+            if self.daily_state_date() != date:
+                return False
+            if not os.path.exists(archive_file):
+                os.makedirs(self.archive_dir, exist_ok=True)
+                atomic_write_csv(pd.read_csv(self.daily_file), archive_file)
+            os.remove(self.daily_file)
+        return True
+
+    def load_history(self):
+        return self.history.read()
+
+    def upsert_history(self, date, time_saved, time_used, efficiency, classes_cancelled):
+        self.history.append(date, time_saved, time_used, efficiency, classes_cancelled)
+
+    def replace_history(self, df):
+        self.history.replace(df)
+
+    def clear_history(self):
+        self.history.clear()
+
+    def compact_history(self):
+        self.history.compact()
+
+
+def rollup_records(user_id, history_df, period):
+    """Rows of the rollups table for one user's history"""
+    return [
+        (user_id, period, row.Date, row.Time_Saved, row.Time_Used,
+         round(row.Efficiency * row.Days), row.Classes_Cancelled, row.Days)
+        for row in compute_rollups(history_df, period).itertuples(index=False)
+    ]
+
+
+class SQLiteDatabase:
+    """One WAL-mode SQLite file shared by every user's SQLiteStorage view.
+
+    Replicas may share the file only when they run on the same host: WAL
+    relies on shared memory, which network filesystems don't provide.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        schedule_columns = (
+            "user_id TEXT NOT NULL, position INTEGER NOT NULL, Day TEXT, Time TEXT, Subject TEXT, "
+            "Duration INTEGER, Status TEXT, Actual_Study INTEGER, Custom_Subject TEXT, "
+            "PRIMARY KEY (user_id, position)"
+        )
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS schedules ({schedule_columns});
+            CREATE TABLE IF NOT EXISTS daily_status ({schedule_columns});
+            CREATE TABLE IF NOT EXISTS history (
+                user_id TEXT NOT NULL, Date TEXT NOT NULL, Time_Saved INTEGER, Time_Used INTEGER,
+                Efficiency INTEGER, Classes_Cancelled INTEGER, PRIMARY KEY (user_id, Date)
+            );
+            CREATE INDEX IF NOT EXISTS idx_daily_status_status ON daily_status(user_id, Status);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS daily_archive (
+                user_id TEXT NOT NULL, Date TEXT NOT NULL, position INTEGER NOT NULL, Day TEXT, Time TEXT,
+                Subject TEXT, Duration INTEGER, Status TEXT, Actual_Study INTEGER, Custom_Subject TEXT,
+                PRIMARY KEY (user_id, Date, position)
+            );
+            CREATE TABLE IF NOT EXISTS rollovers (
+                user_id TEXT NOT NULL, Date TEXT NOT NULL, PRIMARY KEY (user_id, Date)
+            );
+            CREATE TABLE IF NOT EXISTS rollups (
+                user_id TEXT NOT NULL, period TEXT NOT NULL, Date TEXT NOT NULL, Time_Saved INTEGER,
+                Time_Used INTEGER, Efficiency_Sum INTEGER, Classes_Cancelled INTEGER, Days INTEGER,
+                PRIMARY KEY (user_id, period, Date)
+            );
+        """)
+        self._build_rollups()
+
+    def _build_rollups(self):
+        """Backfills the rollups table once for databases created before it existed"""
+        with self.lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE name = 'rollups_built'").fetchone():
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM rollups")
+                for period in PERIODS:
+                    self.conn.executemany(
+                        "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._rollup_records(period)
+                    )
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('rollups_built', '1')")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _rollup_records(self, period):
+        history = pd.read_sql_query("SELECT * FROM history", self.conn)
+        return [
+            record
+            for user_id, group in history.groupby("user_id")
+            for record in rollup_records(user_id, group, period)
+        ]
+
+    def transaction(self, statements, version=None, expected_version=False):
+        """Runs (sql, params_list) pairs atomically; params_list of None means a single execute.
+
+        With version (a meta row name), the counter stored there is checked
+        against expected_version (see Storage), bumped, and the new value returned.
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                new_version = None
+                if version is not None:
+                    row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (version,)).fetchone()
+                    current = row[0] if row else None
+                    if expected_version is not False and current != expected_version:
+                        raise StaleWriteError(f"{version} was modified by another session")
+                    new_version = str(int(current or 0) + 1)
+                    self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (version, new_version))
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        self.conn.executemany(sql, params)
+                    else:
+                        self.conn.execute(sql, params or ())
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return new_version
+
+
+class SQLiteStorage(Storage):
+    """One user's rows in a shared SQLite database (WAL mode, row-level upserts).
+
+    Readers never block the writer, and saving today's history entry touches
+    one indexed row instead of rewriting the whole file.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, database, user_id=DEFAULT_USER, legacy_data_dir=None):
+        self.db = database
+        self.user_id = user_id
+        if legacy_data_dir:
+            self._migrate_csv(legacy_data_dir)
+
+    def _migrate_csv(self, data_dir):
+        """One-time import of existing CSV files so switching backends keeps user data"""
+        marker = f"csv_migrated:{self.user_id}"
+        with self.db.lock:
+            if self.db.conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+                return
+        legacy = CSVStorage(data_dir)
+        schedule, daily, history = legacy.load_schedule(), legacy.load_daily_state(), legacy.load_history()
+        if schedule is not None:
+            self.save_schedule(schedule)
+        if daily is not None:
+            self.save_daily_state(daily)
+        if history is not None and not history.empty:
+            history = history.copy()
+            history["Date"] = pd.to_datetime(history["Date"]).dt.date
+            self.replace_history(history)
+        with self.db.lock:
+            self.db.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, '1')", (marker,))
+
+    def _version_name(self, table):
+        # Never deleted, so a version can't repeat after a clear (which bumps it too)
+        return f"version:{table}:{self.user_id}"
+
+    def _read_rows(self, table):
+        """(rows or None, version) from one read transaction, so they belong together"""
+        conn = self.db.conn
+        with self.db.lock:
+            conn.execute("BEGIN")
+            try:
+                df = pd.read_sql_query(
+                    f"SELECT * FROM {table} WHERE user_id = ? ORDER BY position", conn, params=(self.user_id,)
+                )
+                row = conn.execute("SELECT value FROM meta WHERE name = ?", (self._version_name(table),)).fetchone()
+            finally:
+                conn.execute("COMMIT")
+        version = row[0] if row else None
+        if df.empty:
+            return None, version
+        df = df.drop(columns=["user_id", "position"])
+        df["Custom_Subject"] = df["Custom_Subject"].fillna("")
+        return df, version
+
+    def _save_rows(self, table, df, extra_statements=(), expected_version=False):
+        rows = df.reindex(columns=SCHEDULE_COLUMNS)
+        rows = rows.fillna({"Status": "Active", "Actual_Study": 0, "Custom_Subject": ""})
+        records = [
+            (self.user_id, i, *row)
+            for i, row in enumerate(rows.astype(object).itertuples(index=False, name=None))
+        ]
+        return self.db.transaction([
+            (f"DELETE FROM {table} WHERE user_id = ?", (self.user_id,)),
+            (f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records),
+            *extra_statements,
+        ], version=self._version_name(table), expected_version=expected_version)
+
+    @property
+    def _daily_marker(self):
+        return f"daily_date:{self.user_id}"
+
+    def read_schedule(self):
+        return self._read_rows("schedules")
+
+    def save_schedule(self, df, expected_version=False):
+        return self._save_rows("schedules", df, expected_version=expected_version)
+
+    def clear_schedule(self):
+        self.db.transaction(
+            [("DELETE FROM schedules WHERE user_id = ?", (self.user_id,))], version=self._version_name("schedules")
+        )
+
+    def read_daily_state(self):
+        return self._read_rows("daily_status")
+
+    def save_daily_state(self, df, expected_version=False):
+        stamp = ("INSERT OR REPLACE INTO meta VALUES (?, ?)", (self._daily_marker, str(datetime.date.today())))
+        return self._save_rows("daily_status", df, extra_statements=[stamp], expected_version=expected_version)
+
+    def clear_daily_state(self):
+        self.db.transaction([
+            ("DELETE FROM daily_status WHERE user_id = ?", (self.user_id,)),
+            ("DELETE FROM meta WHERE name = ?", (self._daily_marker,)),
+        ], version=self._version_name("daily_status"))
+
+    def daily_state_date(self):
+        with self.db.lock:
+            row = self.db.conn.execute("SELECT value FROM meta WHERE name = ?", (self._daily_marker,)).fetchone()
+            if row is None:
+                # Saved before dates were recorded - treat it as today's and stamp it
+                if self.db.conn.execute("SELECT 1 FROM daily_status WHERE user_id = ?", (self.user_id,)).fetchone():
+                    today = datetime.date.today()
+                    self.db.conn.execute("INSERT OR IGNORE INTO meta VALUES (?, ?)", (self._daily_marker, str(today)))
+                    return today
+                return None
+        return datetime.date.fromisoformat(row[0])
+
+    def archive_daily_state(self, date):
+        """Archives in one transaction; the rollovers row makes a second run (or replica) a no-op"""
+        conn = self.db.conn
+        with self.db.lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE name = ?", (self._daily_marker,)).fetchone()
+                claimed = conn.execute(
+                    "INSERT OR IGNORE INTO rollovers VALUES (?, ?)", (self.user_id, str(date))
+                ).rowcount
+                if row is None or row[0] != str(date) or not claimed:
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute(
+                    "INSERT OR REPLACE INTO daily_archive SELECT user_id, ?, position, Day, Time, Subject, "
+                    "Duration, Status, Actual_Study, Custom_Subject FROM daily_status WHERE user_id = ?",
+                    (str(date), self.user_id),
+                )
+                conn.execute("DELETE FROM daily_status WHERE user_id = ?", (self.user_id,))
+                conn.execute("DELETE FROM meta WHERE name = ?", (self._daily_marker,))
+                # Sessions still holding the archived rows must not save them back over today
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta VALUES (?, CAST(COALESCE((SELECT value FROM meta WHERE name = ?), 0) + 1 AS TEXT))",
+                    (self._version_name("daily_status"), self._version_name("daily_status")),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def load_history(self):
+        with self.db.lock:
+            df = pd.read_sql_query(
+                "SELECT * FROM history WHERE user_id = ? ORDER BY Date", self.db.conn, params=(self.user_id,)
+            )
+        return None if df.empty else df.drop(columns=["user_id"])
+
+    def has_history(self, date):
+        with self.db.lock:
+            row = self.db.conn.execute(
+                "SELECT 1 FROM history WHERE user_id = ? AND Date = ?", (self.user_id, str(date))
+            ).fetchone()
+        return row is not None
+
+    def upsert_history(self, date, time_saved, time_used, efficiency, classes_cancelled):
+        """Upserts the day and applies the difference to its day/week/month rollups.
+
+        Both happen in one transaction, so the rollups always match the history
+        without ever re-reading it.
+        """
+        date = pd.Timestamp(date).date()
+        new = (int(time_saved), int(time_used), int(efficiency), int(classes_cancelled))
+        conn = self.db.conn
+        with self.db.lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute(
+                    "SELECT Time_Saved, Time_Used, Efficiency, Classes_Cancelled FROM history "
+                    "WHERE user_id = ? AND Date = ?",
+                    (self.user_id, str(date)),
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO history VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(user_id, Date) DO UPDATE SET "
+                    "Time_Saved = excluded.Time_Saved, Time_Used = excluded.Time_Used, "
+                    "Efficiency = excluded.Efficiency, Classes_Cancelled = excluded.Classes_Cancelled",
+                    (self.user_id, str(date), *new),
+                )
+                delta = [n - (o or 0) for n, o in zip(new, old or (0, 0, 0, 0))]
+                conn.executemany(
+                    "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(user_id, period, Date) "
+                    "DO UPDATE SET Time_Saved = Time_Saved + excluded.Time_Saved, "
+                    "Time_Used = Time_Used + excluded.Time_Used, "
+                    "Efficiency_Sum = Efficiency_Sum + excluded.Efficiency_Sum, "
+                    "Classes_Cancelled = Classes_Cancelled + excluded.Classes_Cancelled, "
+                    "Days = Days + excluded.Days",
+                    [
+                        (self.user_id, period, str(period_start(date, period)), *delta, 0 if old else 1)
+                        for period in PERIODS
+                    ],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def replace_history(self, df):
+        records = [
+            (self.user_id, str(row[0]), *row[1:])
+            for row in df[HISTORY_COLUMNS].astype(object).itertuples(index=False, name=None)
+        ]
+        rollups = [r for period in PERIODS for r in rollup_records(self.user_id, df, period)]
+        self.db.transaction([
+            ("DELETE FROM history WHERE user_id = ?", (self.user_id,)),
+            ("INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?, ?, ?)", records),
+            ("DELETE FROM rollups WHERE user_id = ?", (self.user_id,)),
+            ("INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rollups),
+        ])
+
+    def clear_history(self):
+        self.db.transaction([
+            ("DELETE FROM history WHERE user_id = ?", (self.user_id,)),
+            ("DELETE FROM rollups WHERE user_id = ?", (self.user_id,)),
+        ])
+
+    def load_rollups(self, period, since=None):
+        """Reads the materialized rollups; cost depends on the range, not the history size"""
+        start = str(period_start(since, period)) if since is not None else ""
+        with self.db.lock:
+            df = pd.read_sql_query(
+                "SELECT Date, Time_Saved, Time_Used, Efficiency_Sum, Classes_Cancelled, Days FROM rollups "
+                "WHERE user_id = ? AND period = ? AND Date >= ? AND Days > 0 ORDER BY Date",
+                self.db.conn,
+                params=(self.user_id, period, start),
+            )
+        df["Efficiency"] = df["Efficiency_Sum"] / df["Days"].where(df["Days"] > 0, 1)
+        return df[ROLLUP_COLUMNS]
+
+
+class InstrumentedStorage:
+    """Wraps a Storage so every public call is timed into storage_call_seconds{backend, op}"""
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getattr__(self, name):
+        attr = getattr(self._storage, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def timed_call(*args, **kwargs):
+            with get_metrics().timed("storage_call", backend=self._storage.backend, op=name):
+                return attr(*args, **kwargs)
+        return timed_call
+
+
+_storages = {}
+_database = None
+_storage_lock = threading.Lock()
+
+
+def user_data_dir(user_id):
+    """CSV directory for a user; the default user keeps the original data/ layout"""
+    return "data" if user_id == DEFAULT_USER else os.path.join("data", "users", user_id)
+
+
+def _storage_backend():
+    return get_secret("STORAGE_BACKEND", "sqlite")
+
+
+def _get_database():
+    global _database
+    if _database is None:
+        _database = SQLiteDatabase(get_secret("STORAGE_PATH", "data/neuralplan.db"))
+    return _database
+
+
+def list_user_ids():
+    """Every user that currently has a daily state saved"""
+    if _storage_backend() == "csv":
+        users_dir = os.path.join("data", "users")
+        user_ids = sorted(os.listdir(users_dir)) if os.path.isdir(users_dir) else []
+        return [DEFAULT_USER, *user_ids]
+    with _storage_lock:
+        database = _get_database()
+    with database.lock:
+        rows = database.conn.execute("SELECT DISTINCT user_id FROM daily_status").fetchall()
+    return [row[0] for row in rows]
+
+
+def get_storage(user_id=DEFAULT_USER):
+    """Returns the storage for one user, created on first use.
+
+    The backend is chosen by STORAGE_BACKEND ("sqlite" or "csv"). SQLite users
+    share one database file. CSV users each get their own directory. Calls are
+    timed into the metrics registry (see InstrumentedStorage).
+    """
+    with _storage_lock:
+        if user_id not in _storages:
+            backend = _storage_backend()
+            if backend == "csv":
+                storage = CSVStorage(user_data_dir(user_id))
+            elif backend == "sqlite":
+                legacy_dir = user_data_dir(user_id) if user_id == DEFAULT_USER else None
+                storage = SQLiteStorage(_get_database(), user_id, legacy_data_dir=legacy_dir)
+            else:
+                raise ValueError(f"Unknown storage backend: {backend}")
+            _storages[user_id] = InstrumentedStorage(storage)
+        return _storages[user_id]
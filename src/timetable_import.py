@@ -0,0 +1,254 @@
+"""Local import of structured timetable exports (CSV, XLSX, iCalendar) - no API calls"""
+import collections
+import datetime
+import io
+import re
+import zoneinfo
+
+import pandas as pd
+
+STRUCTURED_EXTENSIONS = ("csv", "xlsx", "ics")
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Portal exports name the same thing many ways
+COLUMN_ALIASES = {
+    "Day": ["day", "weekday", "day of week", "dayofweek"],
+    "Time": ["time", "start", "start time", "starttime", "from", "begins"],
+    "End": ["end", "end time", "endtime", "to", "ends"],
+    "Subject": ["subject", "course", "course name", "class", "title", "module", "name", "summary"],
+    "Duration": ["duration", "minutes", "length", "duration (min)", "duration_min", "mins"],
+}
+
+_ICS_DURATION = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?")
+
+
+def is_structured_timetable(filename):
+    """True if the file can be imported locally instead of through Gemini Vision"""
+    return filename.rsplit(".", 1)[-1].lower() in STRUCTURED_EXTENSIONS
+
+
+def parse_structured_timetable(uploaded_file):
+    """Maps a CSV/XLSX/ICS export to the Day, Time, Subject, Duration schema.
+
+    Returns:
+        tuple: (schedule DataFrame, number of rows/events skipped because their
+        day, time or duration couldn't be read).
+
+    Raises:
+        ValueError: If the file doesn't contain a recognisable timetable.
+    """
+    extension = uploaded_file.name.rsplit(".", 1)[-1].lower()
+    data = uploaded_file.getvalue()
+
+    if extension == "ics":
+        df, skipped = _parse_ics(data.decode("utf-8", errors="replace"))
+    elif extension == "xlsx":
+        df, skipped = _map_columns(pd.read_excel(io.BytesIO(data)))
+    elif extension == "csv":
+        df, skipped = _map_columns(pd.read_csv(io.BytesIO(data)))
+    else:
+        raise ValueError(f"Unsupported file type: .{extension}")
+
+    if df.empty:
+        raise ValueError("No classes found in the file.")
+
+    df = df.drop_duplicates(subset=["Day", "Time", "Subject"]).copy()
+    df["_day_order"] = df["Day"].map(DAYS.index)
+    df["_minutes"] = df["Time"].map(_clock_minutes)
+    df = df.sort_values(["_day_order", "_minutes"]).drop(columns=["_day_order", "_minutes"])
+    df["Status"] = "Active"
+    return df.reset_index(drop=True), skipped
+
+
+def _map_columns(raw):
+    """Returns (mapped rows, count of non-blank rows that couldn't be read)"""
+    raw = raw.dropna(how="all")
+    columns = {str(c).strip().lower(): c for c in raw.columns}
+    found = {}
+    for target, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in columns:
+                found[target] = columns[alias]
+                break
+
+    if "Day" not in found and "date" in columns:
+        raw = raw.copy()
+        raw["_day"] = pd.to_datetime(raw[columns["date"]]).dt.day_name()
+        found["Day"] = "_day"
+
+    missing = [c for c in ["Day", "Time", "Subject"] if c not in found]
+    if missing or ("Duration" not in found and "End" not in found):
+        raise ValueError(
+            "Couldn't find the timetable columns. Expected Day, Time, Subject and Duration (or an End time)."
+        )
+
+    total = len(raw)
+    raw = raw.dropna(subset=[found["Day"], found["Time"], found["Subject"]])
+    start = raw[found["Time"]].map(_clock_minutes)
+    if "Duration" in found:
+        duration = pd.to_numeric(raw[found["Duration"]], errors="coerce")
+    else:
+        duration = raw[found["End"]].map(_clock_minutes) - start
+
+    df = pd.DataFrame({
+        "Day": raw[found["Day"]].map(_normalize_day),
+        "Time": start.map(_format_clock),
+        "Subject": raw[found["Subject"]].astype(str).str.strip(),
+        "Duration": duration,
+    })
+    df = df.dropna()
+    df = df[df["Duration"] > 0]
+    df["Duration"] = df["Duration"].astype(int)
+    return df, total - len(df)
+
+
+def _normalize_day(value):
+    text = str(value).strip().lower()
+    for day in DAYS:
+        if len(text) >= 2 and day.lower().startswith(text[:3]):
+            return day
+    return None
+
+
+def _clock_minutes(value):
+    """'2:00 PM', '14:00', '14:00:00' or a time object -> minutes after midnight"""
+    if isinstance(value, (datetime.time, datetime.datetime)):
+        return value.hour * 60 + value.minute
+    text = str(value).strip().upper()
+    for fmt in ("%I:%M %p", "%I:%M%p", "%I %p", "%H:%M", "%H:%M:%S", "%H.%M"):
+        try:
+            parsed = datetime.datetime.strptime(text, fmt)
+            return parsed.hour * 60 + parsed.minute
+        except ValueError:
+            continue
+    return None
+
+
+def _format_clock(minutes):
+    if minutes is None or pd.isna(minutes):
+        return None
+    return datetime.time(int(minutes) // 60, int(minutes) % 60).strftime("%I:%M %p")
+
+
+def _parse_ics(text):
+    """Reads VEVENTs; weekly repeats collapse into one row per Day/Time/Subject.
+
+    Returns (rows, count of timed events that couldn't be read).
+    """
+    # Unfold continuation lines (RFC 5545 3.1)
+    lines = re.sub(r"\r?\n[ \t]", "", text).splitlines()
+    zone = _calendar_zone(lines)
+
+    rows = []
+    skipped = 0
+    event = None
+    for line in lines:
+        if line == "BEGIN:VEVENT":
+            event = {}
+        elif line == "END:VEVENT":
+            if event is not None:
+                row = _ics_event_row(event, zone)
+                if row:
+                    rows.append(row)
+                elif "T" in event.get("DTSTART", ("", {}))[0]:
+                    # All-day events are skipped on purpose; timed ones are data loss
+                    skipped += 1
+            event = None
+        elif event is not None and ":" in line:
+            name, params, value = _split_ics_line(line)
+            event[name] = (value, params)
+
+    return pd.DataFrame(rows, columns=["Day", "Time", "Subject", "Duration"]), skipped
+
+
+def _split_ics_line(line):
+    """'DTSTART;TZID="Europe/Berlin":20240902T090000' -> ("DTSTART", {"TZID": "Europe/Berlin"}, value)"""
+    # The value starts at the first colon outside a quoted parameter value
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ":" and not in_quotes:
+            break
+    head, value = line[:i], line[i + 1:]
+    name, *pairs = head.split(";")
+    params = {}
+    for pair in pairs:
+        key, _, param = pair.partition("=")
+        params[key.upper()] = param.strip('"')
+    return name.upper(), params, value
+
+
+def _calendar_zone(lines):
+    """Zone the calendar's classes happen in, for converting UTC times.
+
+    X-WR-TIMEZONE if the export names one, else its most common TZID, else
+    the TIMEZONE setting. Never the server's own zone, which is usually UTC.
+    """
+    candidates = []
+    tzids = collections.Counter()
+    for line in lines:
+        if ":" not in line:
+            continue
+        name, params, value = _split_ics_line(line)
+        if name == "X-WR-TIMEZONE":
+            candidates.append(value.strip())
+        elif params.get("TZID"):
+            tzids[params["TZID"]] += 1
+    candidates += [tzid for tzid, _ in tzids.most_common()]
+    # Imported here: src.utils depends on this module through schedule_model
+    from src.utils import get_secret
+    candidates.append(get_secret("TIMEZONE", ""))
+    for name in candidates:
+        try:
+            return zoneinfo.ZoneInfo(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            continue
+    return None
+
+
+def _ics_event_row(event, zone=None):
+    start = _ics_datetime(*event.get("DTSTART", ("", {})), zone)
+    if start is None:
+        # All-day events (holidays, exam days) aren't classes
+        return None
+
+    end = _ics_datetime(*event.get("DTEND", ("", {})), zone)
+    if end is not None:
+        duration = int((end - start).total_seconds() // 60)
+    else:
+        match = _ICS_DURATION.fullmatch(event.get("DURATION", ("", {}))[0])
+        if not match:
+            return None
+        days, hours, minutes = (int(g or 0) for g in match.groups())
+        duration = days * 1440 + hours * 60 + minutes
+
+    if duration <= 0:
+        return None
+
+    summary = event.get("SUMMARY", ("", {}))[0].replace("\\,", ",").replace("\\;", ";").replace("\\n", " ").replace("\\\\", "\\")
+    return {
+        "Day": DAYS[start.weekday()],
+        "Time": start.strftime("%I:%M %p"),
+        "Subject": summary.strip() or "Untitled",
+        "Duration": duration,
+    }
+
+
+def _ics_datetime(value, params, zone=None):
+    """Parses a DTSTART/DTEND value into a naive wall-clock time.
+
+    TZID and floating values already are the class's wall-clock time. UTC
+    values ("...Z") are converted to zone, the calendar's zone (see
+    _calendar_zone), and stay in UTC if there is none.
+    """
+    if not value or "T" not in value:
+        return None
+    try:
+        parsed = datetime.datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    except ValueError:
+        return None
+    if value.endswith("Z") and zone is not None:
+        return parsed.replace(tzinfo=datetime.timezone.utc).astimezone(zone).replace(tzinfo=None)
+    return parsed
@@ -1,4 +1,6 @@
 import html
+import streamlit as st
+from src.schedule_model import schedule_metrics
 
 def minutes_to_hours(minutes):
     """Converts 90 → '1h 30m'"""
@@ -13,6 +15,12 @@ def calculate_time_saved(schedule_df):
     if "Status" not in schedule_df.columns or "Duration" not in schedule_df.columns:
         raise ValueError("DataFrame must contain 'Status' and 'Duration' columns")
     
-    cancelled = schedule_df[schedule_df["Status"] == "Cancelled"]
-    total_minutes = cancelled["Duration"].sum()
-    return total_minutes
\ No newline at end of file
+    return schedule_metrics(schedule_df)["free_minutes"]
+
+def get_secret(name, default=None):
+    """Reads an optional setting from st.secrets, falling back to default"""
+    try:
+        return st.secrets.get(name, default)
+    except Exception:
+        # No secrets.toml configured
+        return default